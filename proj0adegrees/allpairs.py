@@ -0,0 +1,156 @@
+"""
+Batch (all-pairs) queries on a graph.Graph.
+
+Instead of one shortest_path call per pair of people, we run a single
+breadth-first search per source person, which gives the degrees of
+separation to everybody at once.  The sources are spread over a
+multiprocessing pool; the CSR arrays are copied once into shared memory,
+and every worker builds a Graph on top of them without copying.
+
+From the distances we get the eccentricity of every source (how far
+away the furthest person it is connected to is), and from those the
+diameter of the graph.  Connected components are computed separately
+by label propagation, which doesn't need a search per person.
+"""
+
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from graph import Graph
+
+ARRAYS = ["person_indptr", "person_indices", "movie_indptr", "movie_indices"]
+
+# the Graph of a pool worker, set up by attach_worker
+worker_graph = None
+worker_memory = []
+
+
+def share_graph(graph):
+    """
+    Copies the CSR arrays of graph into shared memory blocks.
+
+    Returns (blocks, specs), where specs can be handed to attach_worker
+    to rebuild the arrays in another process.  The caller owns the
+    blocks, and must close and unlink them when done.
+    """
+    blocks, specs = [], []
+    for name in ARRAYS:
+        array = np.asarray(getattr(graph, name))
+        block = shared_memory.SharedMemory(create=True,
+                                           size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        specs.append((block.name, array.shape, array.dtype.str))
+    return blocks, specs
+
+
+def attach_worker(specs):
+    """Pool initializer: builds worker_graph on the shared memory blocks."""
+    global worker_graph
+    arrays = []
+    for name, shape, dtype in specs:
+        block = shared_memory.SharedMemory(name=name)
+        # keep the block alive for as long as the worker
+        worker_memory.append(block)
+        arrays.append(np.ndarray(shape, dtype, buffer=block.buf))
+    worker_graph = Graph.from_arrays(*arrays)
+
+
+def eccentricities(sources):
+    """
+    Returns (source, eccentricity, furthest person) for each source,
+    searching worker_graph.
+    """
+    results = []
+    for source in sources:
+        distances = worker_graph.distances(source)
+        furthest = int(np.argmax(distances))
+        results.append((source, int(distances[furthest]), furthest))
+    return results
+
+
+def connected_components(graph):
+    """
+    Returns an array labelling every person with the smallest person
+    index of their connected component.
+    """
+    npeople = len(graph.person_indptr) - 1
+    nmovies = len(graph.movie_indptr) - 1
+    stars = np.asarray(graph.movie_indices)
+    star_movies = np.repeat(np.arange(nmovies),
+                            np.diff(np.asarray(graph.movie_indptr)))
+
+    # every person starts in their own component, and each round every
+    # movie takes the smallest label of its stars, then every star the
+    # smallest label of their movies.  This stops after about
+    # (diameter of the graph) rounds
+    labels = np.arange(npeople)
+    while True:
+        movie_labels = np.full(nmovies, npeople)
+        np.minimum.at(movie_labels, star_movies, labels[stars])
+        updated = labels.copy()
+        np.minimum.at(updated, stars, movie_labels[star_movies])
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def graph_stats(graph, sources=None, processes=None, chunksize=16,
+                progress=True):
+    """
+    Computes the eccentricity of each person in sources (every person
+    by default, pass a smaller sample on big graphs), the diameter
+    that gives, and the connected components of graph.
+
+    Returns a dict with keys:
+        eccentricity: {person index: eccentricity}
+        diameter: the largest eccentricity
+        pair: (person index, person index) at distance diameter
+        components: number of connected components
+        component_sizes: sizes of the components, largest first
+    """
+    npeople = len(graph.person_indptr) - 1
+    if sources is None:
+        sources = range(npeople)
+    sources = list(sources)
+    chunks = [sources[i:i + chunksize]
+              for i in range(0, len(sources), chunksize)]
+
+    eccentricity = {}
+    diameter, pair = -1, None
+    blocks, specs = share_graph(graph)
+    try:
+        with multiprocessing.Pool(processes, initializer=attach_worker,
+                                  initargs=(specs,)) as pool:
+            start = time.perf_counter()
+            done = 0
+            for results in pool.imap_unordered(eccentricities, chunks):
+                for source, ecc, furthest in results:
+                    eccentricity[source] = ecc
+                    if ecc > diameter:
+                        diameter, pair = ecc, (source, furthest)
+                done += len(results)
+                if progress:
+                    rate = done / (time.perf_counter() - start)
+                    print(f"\r{done}/{len(sources)} sources, "
+                          f"{rate:.1f} sources/s", end="", flush=True)
+            if progress:
+                print()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    labels = connected_components(graph)
+    sizes = np.bincount(labels, minlength=npeople)
+    sizes = np.sort(sizes[sizes > 0])[::-1]
+    return {
+        "eccentricity": eccentricity,
+        "diameter": diameter,
+        "pair": pair,
+        "components": len(sizes),
+        "component_sizes": sizes.tolist(),
+    }
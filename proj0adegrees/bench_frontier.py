@@ -0,0 +1,98 @@
+"""
+Micro-benchmark for the frontiers of util.py.
+
+Usage: python bench_frontier.py [people] [costars] [repeats]
+
+Runs a complete breadth-first traversal of a random graph with the
+given number of people, each with about costars neighbors, using
+
+    dict node:  Nodes with a __dict__ (util.Node before __slots__)
+                in a QueueFrontier, with an explored set
+    slots node: util.Node in a QueueFrontier, with an explored set
+    array:      util.ArrayFrontier
+
+and reports the number of people expanded per second.  The graph is
+stored as plain lists so that mostly the frontier is being timed.
+"""
+
+import random
+import sys
+import time
+
+from util import ArrayFrontier, Node, QueueFrontier
+
+
+class DictNode():
+    def __init__(self, state, parent, action):
+        self.state = state
+        self.parent = parent
+        self.action = action
+
+
+def random_graph(npeople, costars, seed=0):
+    """Returns a list of neighbor lists for a random undirected graph."""
+    rng = random.Random(seed)
+    neighbors = [[] for _ in range(npeople)]
+    for person in range(npeople):
+        for _ in range(costars // 2):
+            other = rng.randrange(npeople)
+            neighbors[person].append(other)
+            neighbors[other].append(person)
+    return neighbors
+
+
+def traverse_nodes(neighbors, node_class):
+    frontier = QueueFrontier()
+    explored = set()
+    frontier.add(node_class(0, None, None))
+    expanded = 0
+    while not frontier.empty():
+        node = frontier.remove()
+        explored.add(node.state)
+        expanded += 1
+        for star in neighbors[node.state]:
+            if star not in explored and not frontier.contains_state(star):
+                frontier.add(node_class(star, node, None))
+    return expanded
+
+
+def traverse_array(neighbors, frontier):
+    frontier.clear()
+    frontier.add(0)
+    expanded = 0
+    while not frontier.empty():
+        person = frontier.remove()
+        expanded += 1
+        for star in neighbors[person]:
+            if not frontier.contains_state(star):
+                frontier.add(star, person)
+    return expanded
+
+
+def main():
+    if len(sys.argv) > 4:
+        sys.exit("Usage: python bench_frontier.py [people] [costars] [repeats]")
+    npeople = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    costars = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    neighbors = random_graph(npeople, costars)
+    frontier = ArrayFrontier(npeople)
+    runs = [
+        ("dict node", lambda: traverse_nodes(neighbors, DictNode)),
+        ("slots node", lambda: traverse_nodes(neighbors, Node)),
+        ("array", lambda: traverse_array(neighbors, frontier)),
+    ]
+    for name, run in runs:
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            expanded = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:>10}: {expanded} people, {best:.3f}s, "
+              f"{expanded / best:,.0f} people/s")
+
+
+if __name__ == "__main__":
+    main()
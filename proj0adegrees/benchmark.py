@@ -0,0 +1,120 @@
+"""
+Compares the one-sided and the bidirectional breadth-first searches,
+and the search of the compact csr backend (graph.py) when NumPy is
+available.
+
+Usage: python benchmark.py [directory] [queries]
+
+For each query, a random pair of people is picked, and every search
+is run on it.  We report the total number of people expanded and the
+total wall time for each search, and check that the searches agree
+on the degrees of separation.
+
+If directory is "synthetic", a random dataset is generated in a
+temporary directory instead, which is handy since the large dataset
+is not in the repository.
+"""
+
+import contextlib
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+import degrees
+
+
+def make_synthetic(directory, npeople=20000, nmovies=8000, cast=6, seed=0):
+    """
+    Writes people.csv, movies.csv and stars.csv for a random dataset
+    with npeople people, nmovies movies and cast stars per movie.
+    """
+    rng = random.Random(seed)
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(npeople):
+            writer.writerow([i, f"Person {i}", 1900 + i % 100])
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(nmovies):
+            writer.writerow([i, f"Movie {i}", 1900 + i % 120])
+    with open(os.path.join(directory, "stars.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(nmovies):
+            for person in rng.sample(range(npeople), cast):
+                writer.writerow([person, movie])
+
+
+def run(search, pairs):
+    """
+    Runs search on each pair, and returns the total number of people
+    expanded, the total time taken, and the list of path lengths.
+    """
+    degrees.search_stats['expanded'] = 0
+    lengths = []
+    start = time.perf_counter()
+    # shortest_path prints every path it finds, which we don't want to time
+    with contextlib.redirect_stdout(io.StringIO()):
+        for source, target in pairs:
+            path = search(source, target)
+            lengths.append(None if path is None else len(path))
+    elapsed = time.perf_counter() - start
+    return degrees.search_stats['expanded'], elapsed, lengths
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark.py [directory] [queries]")
+    directory = sys.argv[1] if len(sys.argv) > 1 else "small"
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if directory == "synthetic":
+            make_synthetic(tmp)
+            directory = tmp
+        print("Loading data...")
+        degrees.load_data(directory)
+        try:
+            from graph import Graph
+            compact = Graph.from_csv(directory)
+        except ImportError:
+            print("NumPy not available, skipping the csr backend.")
+            compact = None
+        print("Data loaded.")
+
+    rng = random.Random(0)
+    ids = sorted(degrees.people)
+    pairs = [(rng.choice(ids), rng.choice(ids)) for _ in range(queries)]
+
+    searches = [("bfs", degrees.shortest_path),
+                ("bidirectional", degrees.bidirectional_shortest_path)]
+    if compact is not None:
+        searches.append(("csr", lambda source, target: compact.shortest_path(
+            source, target, degrees.search_stats)))
+        searches.append(("csr scalar", lambda source, target:
+                         compact.shortest_path(source, target,
+                                               degrees.search_stats,
+                                               method="scalar")))
+
+    results = {}
+    for name, search in searches:
+        expanded, elapsed, lengths = run(search, pairs)
+        results[name] = lengths
+        print(f"{name:>14}: {expanded:>10} people expanded, "
+              f"{elapsed:8.3f}s, {1000 * elapsed / queries:8.3f}ms/query")
+
+    if any(lengths != results["bfs"] for lengths in results.values()):
+        sys.exit("The searches disagree on some degrees of separation!")
+
+
+if __name__ == "__main__":
+    main()
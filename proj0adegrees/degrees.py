@@ -1,6 +1,8 @@
 import csv
+import itertools
 import sys
 
+from nameindex import NameSearch
 from util import Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
@@ -23,11 +25,56 @@ people = {}
 # }
 movies = {}
 
+# When load_data is called with backend="csr", this holds the
+# graph.Graph everything is stored in, and people and movies are replaced
+# by read-only views on it.  Otherwise it stays None
+graph = None
 
-def load_data(directory):
+# nameindex.NameSearch over the keys of names, for fuzzy lookups.
+# Built by load_data (or read from the csr snapshot), see suggest_names
+name_search = None
+
+# Optional landmarks.LandmarkIndex on graph, see build_landmarks
+landmarks = None
+
+# Counts the people expanded by the searches, so that different search
+# strategies can be compared.  See benchmark.py
+search_stats = {'expanded': 0}
+
+
+def load_data(directory, backend="dict", snapshot=True, progress=False):
     """
     Load data from CSV files into memory.
+
+    With backend="csr", the data is stored in a compact integer-indexed
+    graph.Graph instead of dicts of sets (this needs NumPy).  people,
+    movies and names are then rebound to views on the graph, so use them
+    as degrees.people etc. rather than importing them.
+
+    The csr backend also keeps a binary snapshot of the graph next to
+    the CSV files (see snapshot.py), and memory-maps it instead of
+    parsing the CSVs when it is up to date.  Pass snapshot=False to
+    always parse the CSVs.  The csr backend streams the CSVs in chunks,
+    and with progress=True prints how many rows it has read.
+
+    Either way, the trigram index of nameindex.py is built (or read from
+    the snapshot) too, so suggestions for a mistyped name are fast.
+    Whatever was loaded before is dropped, landmarks included, so
+    loading again (with either backend) starts afresh.
     """
+    global graph, people, movies, names, name_search, landmarks
+
+    graph = None
+    landmarks = None
+    people = {}
+    movies = {}
+    names = {}
+    if backend == "csr":
+        load_graph(directory, snapshot, progress)
+        return
+    elif backend != "dict":
+        raise ValueError(f"unknown backend {backend}")
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -62,37 +109,158 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    name_search = NameSearch(names)
+
+
+def load_graph(directory, snapshot=True, progress=False):
+    """
+    Load data from CSV files (or their snapshot) into a graph.Graph,
+    and point people, movies and names at it.
+    """
+    global graph, people, movies, names, name_search
+    from graph import Graph, PeopleView, MoviesView
+
+    nameindex = None
+    if snapshot:
+        from snapshot import load_or_build
+        graph, nameindex, name_search = load_or_build(directory, progress)
+    else:
+        graph = Graph.from_csv(directory, progress=progress)
+        name_search = NameSearch(graph.person_names)
+    people = PeopleView(graph)
+    movies = MoviesView(graph)
+    if nameindex is not None:
+        names = nameindex
+    else:
+        for person_id, name in zip(graph.person_ids, graph.person_names):
+            names.setdefault(name.lower(), set()).add(person_id)
+
+
+def build_landmarks(k=16):
+    """
+    Builds a landmarks.LandmarkIndex with k landmarks on the loaded csr
+    graph.  shortest_path then uses it to prune its search, and
+    separation_bounds can answer without searching.
+    """
+    global landmarks
+    from landmarks import LandmarkIndex
+
+    if graph is None:
+        raise ValueError("landmarks need the csr backend")
+    landmarks = LandmarkIndex.build(graph, k)
+
+
+def separation_bounds(source, target):
+    """
+    Returns (lower, upper) bounds on the degrees of separation between
+    two person ids, from the landmark index.  Both are math.inf if the
+    two people are not connected.
+    """
+    return landmarks.bounds(graph, source, target)
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = sys.argv[1:]
+    bidirectional = "--bidirectional" in args
+    if bidirectional:
+        args.remove("--bidirectional")
+    backend = "dict"
+    if "--csr" in args:
+        args.remove("--csr")
+        backend = "csr"
+    use_landmarks = "--landmarks" in args
+    if use_landmarks:
+        args.remove("--landmarks")
+        backend = "csr"
+    top = None
+    if "--top" in args:
+        i = args.index("--top")
+        try:
+            top = int(args[i + 1])
+        except (IndexError, ValueError):
+            sys.exit("--top needs a number of paths")
+        del args[i:i + 2]
+    if len(args) > 1:
+        sys.exit("Usage: python degrees.py [--bidirectional] [--csr] "
+                 "[--landmarks] [--top K] [directory]")
+    directory = args[0] if len(args) == 1 else "large"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, backend, progress=True)
+    if use_landmarks:
+        build_landmarks()
     print("Data loaded.")
 
-    source = person_id_for_name(input("Name: "))
+    source = prompt_person()
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = prompt_person()
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if use_landmarks:
+        lower, upper = separation_bounds(source, target)
+        print(f"Between {lower} and {upper} degrees of separation.")
+
+    if top is not None:
+        found = False
+        for n, path in enumerate(k_shortest_paths(source, target, top), 1):
+            print(f"Connection {n}:")
+            print_path(source, path)
+            found = True
+        if not found:
+            print("Not connected.")
+        return
+
+    if bidirectional:
+        path = bidirectional_shortest_path(source, target)
+    else:
+        path = shortest_path(source, target)
 
     if path is None:
         print("Not connected.")
     else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print_path(source, path)
+
+
+def prompt_person():
+    """
+    Asks for a name and returns the person id for it, offering the
+    closest names if it isn't found, or None.
+    """
+    name = input("Name: ")
+    person_id = person_id_for_name(name)
+    if person_id is not None:
+        return person_id
+    suggestions = suggest_names(name)
+    if len(suggestions) == 0:
+        return None
+    print(f"'{name}' not found. Did you mean:")
+    for i, suggestion in enumerate(suggestions, 1):
+        print(f"{i}: {suggestion}")
+    try:
+        choice = int(input("Number (or nothing to give up): "))
+        if 1 <= choice <= len(suggestions):
+            return person_id_for_name(suggestions[choice - 1])
+    except ValueError:
+        pass
+    return None
+
+
+def print_path(source, path):
+    """
+    Prints the degrees of separation and the movies
+    along a path starting at source.
+    """
+    degrees = len(path)
+    print(f"{degrees} degrees of separation.")
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = people[path[i][1]]["name"]
+        person2 = people[path[i + 1][1]]["name"]
+        movie = movies[path[i + 1][0]]["title"]
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
 def shortest_path(source, target):
@@ -114,14 +282,25 @@ def shortest_path(source, target):
     # actors and edges labelled by movies.  I suppose you could do things
     # the other way around, but it shouldn't make much difference.
 
+    # The compact backend runs this same search on dense integers with an
+    # ArrayFrontier, which allocates nothing per person.  Landmarks need
+    # its bidirectional search, see bidirectional_shortest_path
+    if graph is not None:
+        if landmarks is not None:
+            return graph.shortest_path(source, target, search_stats,
+                                       landmarks)
+        return graph.shortest_path(source, target, search_stats,
+                                   method="scalar")
+
     #initialize frontier and explored set
     frontier = QueueFrontier()
     explored = set()
     
-    # if source and target are equal, pick a random movie, and
+    # if source and target are equal, pick one of their movies (the
+    # smallest id, so the answer doesn't change between runs), and
     # return the appropriate list
     if source == target:
-        sourcemovies = list(people[target]['movies'])
+        sourcemovies = sorted(people[target]['movies'])
         if len(sourcemovies) == 0:
             return None
         return [(sourcemovies[0],target)]
@@ -138,6 +317,7 @@ def shortest_path(source, target):
 
         # pop person from frontier, add them to list of explored ppl
         currnode = frontier.remove()
+        search_stats['expanded'] += 1
         explored.add(currnode.state) # this adds the person_id to the explored set
 
         # iterate through the movies.  For each one, iterate through the list
@@ -167,6 +347,214 @@ def shortest_path(source, target):
     return None
 
 
+def bidirectional_shortest_path(source, target):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using a bidirectional
+    breadth-first search.
+
+    If no possible path, returns None.
+    """
+
+    # The idea is to grow one BFS tree from the source and another one
+    # from the target, always expanding a whole layer of whichever side
+    # currently has the smaller frontier.  On the large dataset the number
+    # of people at distance d grows very quickly with d, so two searches
+    # of depth d/2 are much cheaper than one search of depth d.
+
+    if graph is not None:
+        return graph.shortest_path(source, target, search_stats, landmarks)
+
+    # same convention as shortest_path for the degenerate case
+    if source == target:
+        sourcemovies = sorted(people[target]['movies'])
+        if len(sourcemovies) == 0:
+            return None
+        return [(sourcemovies[0], target)]
+
+    # parents[person] = (movie, person one step closer to that side's root)
+    # depths[person] = number of steps from that side's root
+    forward_parents = {source: None}
+    backward_parents = {target: None}
+    forward_depths = {source: 0}
+    backward_depths = {target: 0}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+
+        # expand the cheaper side
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier = forward_frontier
+            parents, depths = forward_parents, forward_depths
+            other_depths = backward_depths
+        else:
+            frontier = backward_frontier
+            parents, depths = backward_parents, backward_depths
+            other_depths = forward_depths
+
+        # expand the whole layer before checking for a meeting point.
+        # Stopping at the first meeting found can give a path that is
+        # one step too long, since a shorter one may join through a
+        # person later in the same layer.
+        nextlayer = []
+        best = None
+        for person in frontier:
+            search_stats['expanded'] += 1
+            for movie, star in neighbors_for_person(person):
+                if star in depths:
+                    continue
+                parents[star] = (movie, person)
+                depths[star] = depths[person] + 1
+                nextlayer.append(star)
+                if star in other_depths:
+                    length = depths[star] + other_depths[star]
+                    if best is None or length < best[0]:
+                        best = (length, star)
+
+        if frontier is forward_frontier:
+            forward_frontier = nextlayer
+        else:
+            backward_frontier = nextlayer
+
+        if best is not None:
+            return join_paths(forward_parents, backward_parents, best[1])
+
+    return None
+
+
+def join_paths(forward_parents, backward_parents, meeting):
+    """
+    Returns the (movie_id, person_id) path from the root of forward_parents
+    to the root of backward_parents, through the person meeting.
+    """
+    # walk back from the meeting person to the source
+    path = []
+    person = meeting
+    while forward_parents[person]:
+        movie, previous = forward_parents[person]
+        path.append((movie, person))
+        person = previous
+    path.reverse()
+
+    # then walk forward from the meeting person to the target
+    person = meeting
+    while backward_parents[person]:
+        movie, following = backward_parents[person]
+        path.append((movie, following))
+        person = following
+    return path
+
+
+def paths_by_length(source, target):
+    """
+    Yields every distinct (movie_id, person_id) path from the source to
+    the target, shortest first, lazily.  A path never goes through the
+    same person or the same movie twice.
+    """
+
+    # if source and target are equal, every one of their movies is a
+    # "path", following the convention of shortest_path
+    if source == target:
+        for movie in sorted(people[source]['movies']):
+            yield [(movie, source)]
+        return
+
+    # distances[person] = degrees of separation from person to target.
+    # We grow this BFS from the target one layer at a time, only as far
+    # as the longest paths asked for so far need.  For the shortest
+    # length, the people it allows at each step are exactly the BFS
+    # layer DAG between source and target
+    distances = {target: 0}
+    layer = [target]
+    depth = 0
+
+    def grow():
+        nonlocal layer, depth
+        nextlayer = []
+        for person in layer:
+            search_stats['expanded'] += 1
+            for movie, star in neighbors_for_person(person):
+                if star not in distances:
+                    distances[star] = depth + 1
+                    nextlayer.append(star)
+        layer = nextlayer
+        depth += 1
+
+    while source not in distances:
+        if not layer:
+            return
+        grow()
+
+    def extend(person, remaining, path, used_people, used_movies):
+        """
+        Yields the paths of exactly remaining more steps from person
+        to target that extend path.
+        """
+        if remaining == 0:
+            if person == target:
+                yield list(path)
+            return
+        for movie, star in sorted(neighbors_for_person(person)):
+            if (star in used_people or movie in used_movies
+                    or distances.get(star, remaining) > remaining - 1):
+                continue
+            path.append((movie, star))
+            used_people.add(star)
+            used_movies.add(movie)
+            yield from extend(star, remaining - 1, path,
+                              used_people, used_movies)
+            path.pop()
+            used_people.remove(star)
+            used_movies.remove(movie)
+
+    # a path can't visit more people than the target's component has,
+    # and every person of the component is in distances once the
+    # BFS runs out of layers
+    length = distances[source]
+    while layer or length < len(distances):
+        # paths of this length only go through people at distance
+        # at most length - 1 from the target
+        while layer and depth < length - 1:
+            grow()
+        yield from extend(source, length, [], {source}, set())
+        length += 1
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest (movie_id, person_id) path
+    from the source to the target, lazily.
+    """
+    length = None
+    for path in paths_by_length(source, target):
+        if length is None:
+            length = len(path)
+        elif len(path) > length:
+            return
+        yield path
+
+
+def k_shortest_paths(source, target, k):
+    """
+    Yields the k shortest distinct (movie_id, person_id) paths
+    from the source to the target, lazily, shortest first.
+    """
+    return itertools.islice(paths_by_length(source, target), k)
+
+
+def suggest_names(name, limit=5):
+    """
+    Returns up to limit names closest to a name that wasn't found,
+    closest first, spelled as they are in the data.
+    """
+    suggestions = []
+    for _, match in name_search.search(name, limit=limit):
+        person_id = next(iter(names[match]))
+        suggestions.append(people[person_id]["name"])
+    return suggestions
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
@@ -198,6 +586,8 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return graph.neighbors_for_person(person_id)
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -0,0 +1,417 @@
+"""
+Compact graph backend for degrees.py.
+
+People and movies are mapped to dense integers (their position in the
+CSV files), and the bipartite person-movie adjacency is stored twice
+in compressed sparse row (CSR) form:
+
+    movies of person i:  person_indices[person_indptr[i]:person_indptr[i+1]]
+    stars of movie j:    movie_indices[movie_indptr[j]:movie_indptr[j+1]]
+
+This needs a few bytes per star instead of a Python set entry per star,
+and lets the searches work on whole BFS layers at once with NumPy.
+
+PeopleView and MoviesView give back the old dict of dicts interface
+on top of a Graph, so the rest of degrees.py doesn't have to care
+which backend is loaded.
+"""
+
+import math
+from collections.abc import Mapping
+
+import numpy as np
+
+import loader
+from util import ArrayFrontier
+
+
+class Graph():
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_indptr, person_indices, movie_indptr, movie_indices,
+                 person_index=None, movie_index=None):
+        # original string ids, names etc., indexed by dense integer
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+
+        # reused by every scalar_shortest_path call, see there
+        self.scalar_frontier = None
+
+        # and the reverse mapping, from string id to dense integer.
+        # snapshot.py passes in lookups that don't need building
+        if person_index is None:
+            person_index = {pid: i for i, pid in enumerate(person_ids)}
+        if movie_index is None:
+            movie_index = {mid: i for i, mid in enumerate(movie_ids)}
+        self.person_index = person_index
+        self.movie_index = movie_index
+
+        self.person_indptr = person_indptr
+        self.person_indices = person_indices
+        self.movie_indptr = movie_indptr
+        self.movie_indices = movie_indices
+
+    @classmethod
+    def from_csv(cls, directory, chunksize=None, progress=False):
+        """
+        Builds a Graph from the people.csv, movies.csv and stars.csv
+        files in directory, streaming them in chunks (see loader.py).
+        If progress is True, the rows read and rows/s are printed.
+        """
+        chunksize = chunksize or loader.CHUNKSIZE
+        person_ids, person_names, person_births = loader.read_table(
+            f"{directory}/people.csv", chunksize, progress)
+        movie_ids, movie_titles, movie_years = loader.read_table(
+            f"{directory}/movies.csv", chunksize, progress)
+
+        person_index = {pid: i for i, pid in enumerate(person_ids)}
+        movie_index = {mid: i for i, mid in enumerate(movie_ids)}
+        arrays = loader.load_stars(f"{directory}/stars.csv", person_index,
+                                   movie_index, chunksize, progress)
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years, *arrays,
+                   person_index=person_index, movie_index=movie_index)
+
+    @classmethod
+    def from_arrays(cls, person_indptr, person_indices,
+                    movie_indptr, movie_indices):
+        """
+        Builds a Graph from the CSR arrays alone.  The ids of people and
+        movies are then their dense integers, and there are no names.
+        """
+        npeople = len(person_indptr) - 1
+        nmovies = len(movie_indptr) - 1
+        return cls(range(npeople), None, None, range(nmovies), None, None,
+                   person_indptr, person_indices, movie_indptr, movie_indices,
+                   person_index=range(npeople), movie_index=range(nmovies))
+
+    def movies_of(self, person):
+        """Returns the array of movie indices of the person with index person."""
+        return self.person_indices[
+            self.person_indptr[person]:self.person_indptr[person + 1]]
+
+    def stars_of(self, movie):
+        """Returns the array of person indices of the movie with index movie."""
+        return self.movie_indices[
+            self.movie_indptr[movie]:self.movie_indptr[movie + 1]]
+
+    def neighbors_for_person(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        neighbors = set()
+        for movie in self.movies_of(self.person_index[person_id]).tolist():
+            movie_id = self.movie_ids[movie]
+            for star in self.stars_of(movie).tolist():
+                neighbors.add((movie_id, self.person_ids[star]))
+        return neighbors
+
+    def shortest_path(self, source_id, target_id, stats=None, landmarks=None,
+                      method="layers"):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs
+        that connect the source to the target.
+
+        If no possible path, returns None.  If stats is a dict, the
+        number of people expanded is added to stats['expanded'].  If
+        landmarks is a landmarks.LandmarkIndex, its bounds are used to
+        skip people who can't be on a shortest path.
+
+        method="layers" runs a bidirectional search a layer at a time
+        with NumPy, and method="scalar" the one-sided search of
+        degrees.shortest_path on an ArrayFrontier (without landmarks).
+        """
+        if method == "scalar":
+            return self.scalar_shortest_path(source_id, target_id, stats)
+        elif method != "layers":
+            raise ValueError(f"unknown method {method}")
+
+        source = self.person_index[source_id]
+        target = self.person_index[target_id]
+
+        # same convention as degrees.shortest_path for the degenerate case:
+        # the movie with the smallest id, as the rows are sorted by dense
+        # integer rather than by id
+        if source == target:
+            sourcemovies = self.movies_of(source)
+            if len(sourcemovies) == 0:
+                return None
+            movie_id = min(self.movie_ids[movie]
+                           for movie in sourcemovies.tolist())
+            return [(movie_id, target_id)]
+
+        forward_prune = backward_prune = None
+        if landmarks is not None:
+            lower, upper = landmarks.index_bounds(source, target)
+            if lower == math.inf:
+                return None
+
+            def prune(root):
+                def far(people, depths):
+                    bounds = landmarks.lower_bounds(people, root)
+                    return (bounds == math.inf) | (depths + bounds > upper)
+                return far
+            forward_prune, backward_prune = prune(target), prune(source)
+
+        forward = SearchSide(self, source, forward_prune)
+        backward = SearchSide(self, target, backward_prune)
+        while len(forward.frontier) and len(backward.frontier):
+            side, other = ((forward, backward)
+                           if len(forward.frontier) <= len(backward.frontier)
+                           else (backward, forward))
+            if stats is not None:
+                stats['expanded'] += len(side.frontier)
+            reached = side.expand()
+
+            # a person reached by both sides joins the two trees; the whole
+            # layer has been expanded, so take the meeting point with
+            # the smallest total length
+            meetings = reached[other.depth[reached] >= 0]
+            if len(meetings):
+                lengths = side.depth[meetings] + other.depth[meetings]
+                meeting = int(meetings[np.argmin(lengths)])
+                return self.join_paths(forward, backward, meeting)
+        return None
+
+    def scalar_shortest_path(self, source_id, target_id, stats=None):
+        """
+        Same search as degrees.shortest_path: breadth-first from the
+        source, one person at a time, stopping as soon as the target is
+        seen.  It runs on dense integers with an ArrayFrontier, so it
+        allocates nothing per person.  Not safe to use from several
+        threads at once, as the frontier is shared.
+        """
+        source = self.person_index[source_id]
+        target = self.person_index[target_id]
+        if source == target:
+            return self.shortest_path(source_id, target_id)
+
+        if self.scalar_frontier is None:
+            self.scalar_frontier = ArrayFrontier(len(self.person_indptr) - 1)
+        frontier = self.scalar_frontier
+        frontier.clear()
+
+        # memoryviews index to plain ints, much faster than NumPy scalars
+        person_indptr = memoryview(self.person_indptr)
+        person_indices = memoryview(self.person_indices)
+        movie_indptr = memoryview(self.movie_indptr)
+        movie_indices = memoryview(self.movie_indices)
+
+        expanded = 0
+        frontier.add(source)
+        try:
+            while not frontier.empty():
+                person = frontier.remove()
+                expanded += 1
+                for k in range(person_indptr[person], person_indptr[person + 1]):
+                    movie = person_indices[k]
+                    for j in range(movie_indptr[movie], movie_indptr[movie + 1]):
+                        star = movie_indices[j]
+                        if star == target:
+                            frontier.add(star, person, movie)
+                            return [(self.movie_ids[movie], self.person_ids[star])
+                                    for movie, star in frontier.path(star)]
+                        elif not frontier.contains_state(star):
+                            frontier.add(star, person, movie)
+            return None
+        finally:
+            if stats is not None:
+                stats['expanded'] += expanded
+
+    def bfs_tree(self, source):
+        """
+        Returns the SearchSide of a breadth-first search from the person
+        with index source, expanded until everyone connected is reached.
+        """
+        side = SearchSide(self, source)
+        while len(side.frontier):
+            side.expand()
+        return side
+
+    def distances(self, source):
+        """
+        Returns an array with the degrees of separation between the person
+        with index source and every person, or -1 for people who are not
+        connected to source.
+        """
+        return self.bfs_tree(source).depth
+
+    def tree_path(self, tree, target_id):
+        """
+        Returns the (movie_id, person_id) path from the root of the
+        fully expanded SearchSide tree to target_id, or None if they
+        are not connected.
+        """
+        target = self.person_index[target_id]
+        if tree.depth[target] < 0:
+            return None
+        path = []
+        person = target
+        while tree.parent[person] >= 0:
+            path.append((self.movie_ids[tree.parent_movie[person]],
+                         self.person_ids[person]))
+            person = int(tree.parent[person])
+        path.reverse()
+        return path
+
+    def join_paths(self, forward, backward, meeting):
+        """
+        Returns the (movie_id, person_id) path from the root of forward
+        to the root of backward, through the person with index meeting.
+        """
+        path = []
+        person = meeting
+        while forward.parent[person] >= 0:
+            path.append((self.movie_ids[forward.parent_movie[person]],
+                         self.person_ids[person]))
+            person = int(forward.parent[person])
+        path.reverse()
+
+        person = meeting
+        while backward.parent[person] >= 0:
+            following = int(backward.parent[person])
+            path.append((self.movie_ids[backward.parent_movie[person]],
+                         self.person_ids[following]))
+            person = following
+        return path
+
+
+class SearchSide():
+    """
+    One half of a bidirectional breadth-first search on a Graph.
+
+    Keeps a parent pointer, the movie used to get there and a depth
+    for every person, plus a flag for every movie already expanded.
+
+    If prune is given, prune(people, depths) returns a mask of the newly
+    reached people that should be dropped instead of added to the tree.
+    """
+
+    def __init__(self, graph, root, prune=None):
+        npeople = len(graph.person_indptr) - 1
+        nmovies = len(graph.movie_indptr) - 1
+        self.graph = graph
+        self.prune = prune
+        self.parent = np.full(npeople, -1, dtype=np.int32)
+        self.parent_movie = np.full(npeople, -1, dtype=np.int32)
+        self.depth = np.full(npeople, -1, dtype=np.int32)
+        self.movie_seen = np.zeros(nmovies, dtype=bool)
+        self.depth[root] = 0
+        self.frontier = np.array([root], dtype=np.int32)
+
+    def expand(self):
+        """
+        Expands the whole frontier by one layer, and returns the array
+        of newly reached people, which becomes the new frontier.
+        """
+        graph = self.graph
+
+        # all (person, movie) pairs leaving the frontier.  A movie only
+        # needs expanding once: all its stars are reached the first time
+        positions, movies = gather(graph.person_indptr, graph.person_indices,
+                                   self.frontier)
+        movies, first = np.unique(movies, return_index=True)
+        owners = self.frontier[positions[first]]
+        fresh = ~self.movie_seen[movies]
+        movies, owners = movies[fresh], owners[fresh]
+        self.movie_seen[movies] = True
+
+        # all (movie, star) pairs for those movies
+        positions, stars = gather(graph.movie_indptr, graph.movie_indices,
+                                  movies)
+        unseen = self.depth[stars] < 0
+        stars, positions = stars[unseen], positions[unseen]
+        stars, first = np.unique(stars, return_index=True)
+        positions = positions[first]
+        depths = self.depth[owners[positions]] + 1
+
+        if self.prune is not None:
+            keep = ~self.prune(stars, depths)
+            stars, positions, depths = stars[keep], positions[keep], depths[keep]
+
+        self.parent[stars] = owners[positions]
+        self.parent_movie[stars] = movies[positions]
+        self.depth[stars] = depths
+        self.frontier = stars
+        return stars
+
+
+def gather(indptr, indices, rows):
+    """
+    Returns (positions, values) for the CSR rows selected by rows, where
+    values is the concatenation of those rows, and positions[k] is the
+    position in rows of the row that values[k] came from.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    positions = np.repeat(np.arange(len(rows)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts,
+                                                  counts)
+    return positions, indices[np.repeat(starts, counts) + offsets]
+
+
+class PeopleView(Mapping):
+    """
+    Read-only dict-like view of a Graph with the same shape as the
+    people dict of degrees.py:
+
+        people[person_id] = {'name': ..., 'birth': ..., 'movies': {...}}
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        i = graph.person_index[person_id]
+        return {
+            "name": graph.person_names[i],
+            "birth": graph.person_births[i],
+            "movies": {graph.movie_ids[m] for m in graph.movies_of(i).tolist()}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+    def __contains__(self, person_id):
+        return person_id in self.graph.person_index
+
+
+class MoviesView(Mapping):
+    """
+    Read-only dict-like view of a Graph with the same shape as the
+    movies dict of degrees.py:
+
+        movies[movie_id] = {'title': ..., 'year': ..., 'stars': {...}}
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        j = graph.movie_index[movie_id]
+        return {
+            "title": graph.movie_titles[j],
+            "year": graph.movie_years[j],
+            "stars": {graph.person_ids[p] for p in graph.stars_of(j).tolist()}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+    def __contains__(self, movie_id):
+        return movie_id in self.graph.movie_index
@@ -0,0 +1,112 @@
+"""
+Landmark distance index for the compact graph backend of degrees.py.
+
+We run a full breadth-first search from each of k landmarks (the
+people with the most co-stars), and keep the degrees of separation
+from every landmark to every person as uint8, so a million people and
+16 landmarks take 16MB.  By the triangle inequality, for any landmark l
+
+    |d(l, s) - d(l, t)|  <=  d(s, t)  <=  d(l, s) + d(l, t)
+
+so bounds() gives a lower and an upper bound on the degrees of
+separation between two people without any search.  If a landmark
+reaches exactly one of s and t, they are not connected at all.
+
+Graph.shortest_path can also use the index to prune its search: a
+person v reached at depth d from s can only be on a shortest path if
+d + lower(v, t) <= upper(s, t).
+"""
+
+import math
+
+import numpy as np
+
+# distance stored for people a landmark doesn't reach
+UNREACHABLE = 255
+
+
+class LandmarkIndex():
+
+    def __init__(self, landmarks, distances):
+        # landmarks[i] is the person index of landmark i, and
+        # distances[p, i] the degrees of separation between person p and it
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, k=16):
+        """
+        Builds the index for graph, using the k people with the most
+        co-stars as landmarks.
+        """
+        npeople = len(graph.person_indptr) - 1
+        k = min(k, npeople)
+
+        # number of co-stars of each person, counting repeats
+        movie_sizes = np.diff(np.asarray(graph.movie_indptr))
+        person_rows = np.repeat(np.arange(npeople),
+                                np.diff(np.asarray(graph.person_indptr)))
+        costars = np.bincount(person_rows,
+                              weights=movie_sizes[graph.person_indices],
+                              minlength=npeople)
+        landmarks = np.argsort(-costars, kind="stable")[:k].astype(np.int32)
+
+        distances = np.empty((npeople, k), dtype=np.uint8)
+        for i, landmark in enumerate(landmarks):
+            depth = graph.distances(int(landmark))
+            column = np.minimum(depth, UNREACHABLE - 1)
+            column[depth < 0] = UNREACHABLE
+            distances[:, i] = column
+        return cls(landmarks, distances)
+
+    def save(self, path):
+        """Saves the index to path (a .npz file)."""
+        np.savez(path, landmarks=self.landmarks, distances=self.distances)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["landmarks"], data["distances"])
+
+    def lower_bounds(self, people, target):
+        """
+        Returns an array of lower bounds on the degrees of separation
+        between each person index in people and the person index target,
+        with math.inf for people known not to be connected to target.
+        """
+        rows = self.distances[people].astype(np.int16)
+        column = self.distances[target].astype(np.int16)
+        reached = rows != UNREACHABLE
+        target_reached = column != UNREACHABLE
+
+        both = reached & target_reached
+        bounds = np.where(both, np.abs(rows - column), 0).max(axis=1,
+                                                              initial=0)
+        bounds = bounds.astype(float)
+        bounds[(reached != target_reached).any(axis=1)] = math.inf
+        return bounds
+
+    def index_bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        the person indices source and target.  Both are math.inf when
+        the index proves they are not connected.
+        """
+        if source == target:
+            return 0, 0
+        lower = self.lower_bounds(np.array([source]), target)[0]
+        if lower == math.inf:
+            return math.inf, math.inf
+        rows = self.distances[[source, target]].astype(np.int16)
+        reached = (rows != UNREACHABLE).all(axis=0)
+        upper = (rows.sum(axis=0)[reached].min() if reached.any()
+                 else math.inf)
+        return max(int(lower), 1), upper if upper == math.inf else int(upper)
+
+    def bounds(self, graph, source_id, target_id):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        the people with ids source_id and target_id in graph.
+        """
+        return self.index_bounds(graph.person_index[source_id],
+                                 graph.person_index[target_id])
@@ -0,0 +1,205 @@
+"""
+Streaming, chunked CSV loader for the compact graph backend.
+
+The CSV files are read CHUNKSIZE rows at a time with csv.reader, and
+person and movie ids are interned as dense integers (their position in
+people.csv and movies.csv) as they are read.
+
+stars.csv is read twice.  The first pass only counts the stars of every
+person and every movie, which gives the exact size of the CSR arrays;
+the second pass fills them in place, chunk by chunk.  So apart from the
+id dictionaries, peak memory is the final arrays plus one chunk, instead
+of a Python list of every star pair.
+
+Rows of stars.csv with unknown ids are skipped, as in load_data, but
+counted and reported rather than dropped silently.
+"""
+
+import csv
+import itertools
+import sys
+import time
+
+import numpy as np
+
+CHUNKSIZE = 100000
+
+
+class Progress():
+    """
+    Prints the number of rows read so far and the throughput, on
+    a single line of stream.  Does nothing if enabled is False.
+    """
+
+    def __init__(self, label, enabled=True, stream=sys.stdout):
+        self.label = label
+        self.enabled = enabled
+        self.stream = stream
+        self.rows = 0
+        self.start = time.perf_counter()
+
+    def update(self, rows):
+        self.rows += rows
+        if self.enabled:
+            print(f"\r{self.label}: {self.rows} rows, "
+                  f"{self.rate():.0f} rows/s", end="", file=self.stream,
+                  flush=True)
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.start
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def done(self, note=""):
+        if self.enabled:
+            print(f"\r{self.label}: {self.rows} rows, "
+                  f"{self.rate():.0f} rows/s{note}", file=self.stream)
+
+
+def read_chunks(path, chunksize=CHUNKSIZE):
+    """
+    Yields the rows of the CSV file at path (without its header) in
+    lists of at most chunksize rows.  Blank lines are skipped, as
+    csv.DictReader does for load_data.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        while True:
+            chunk = list(itertools.islice(reader, chunksize))
+            if not chunk:
+                return
+            chunk = [row for row in chunk if row]
+            if chunk:
+                yield chunk
+
+
+def read_table(path, chunksize=CHUNKSIZE, progress=False):
+    """
+    Reads a people.csv or movies.csv file, and returns its three
+    columns (id, name or title, birth or year) as lists.
+    """
+    ids, labels, dates = [], [], []
+    report = Progress(path, progress)
+    for chunk in read_chunks(path, chunksize):
+        for row in chunk:
+            ids.append(row[0])
+            labels.append(row[1])
+            dates.append(row[2])
+        report.update(len(chunk))
+    report.done()
+    return ids, labels, dates
+
+
+def intern_chunk(chunk, person_index, movie_index):
+    """
+    Returns arrays of the person and movie indices of a chunk of
+    stars.csv rows, leaving out the rows with an unknown id.
+    """
+    people = np.fromiter((person_index.get(row[0], -1) for row in chunk),
+                         dtype=np.int32, count=len(chunk))
+    movies = np.fromiter((movie_index.get(row[1], -1) for row in chunk),
+                         dtype=np.int32, count=len(chunk))
+    known = (people >= 0) & (movies >= 0)
+    return people[known], movies[known]
+
+
+def fill_rows(indptr, indices, cursor, rows, values):
+    """
+    Appends values[k] to CSR row rows[k] for every k, where cursor holds
+    the number of entries already written in each row.
+    """
+    order = np.argsort(rows, kind="stable")
+    rows, values = rows[order], values[order]
+
+    # the rank of each entry among the entries of the same row
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    ranks = np.arange(len(rows)) - np.repeat(starts,
+                                             np.diff(np.r_[starts, len(rows)]))
+
+    indices[indptr[rows] + cursor[rows] + ranks] = values
+    cursor += np.bincount(rows, minlength=len(cursor)).astype(cursor.dtype)
+
+
+def dedupe_rows(indptr, indices, blocksize=CHUNKSIZE):
+    """
+    Sorts every CSR row and drops repeated entries, returning the new
+    (indptr, indices).  The rows are done a block of about blocksize
+    entries at a time, and compacted to the front of indices as they
+    go, so only one block is ever sorted or copied.
+    """
+    nrows = len(indptr) - 1
+    counts = np.zeros(nrows, dtype=np.int64)
+    written = 0
+    first = 0
+    while first < nrows:
+        # whole rows, at least one, up to blocksize entries
+        last = int(np.searchsorted(indptr, indptr[first] + blocksize,
+                                   side="right")) - 1
+        last = max(last, first + 1)
+        rows = np.repeat(np.arange(last - first, dtype=np.int32),
+                         np.diff(indptr[first:last + 1]))
+        block = indices[indptr[first]:indptr[last]]
+        order = np.lexsort((block, rows))
+        rows, block = rows[order], block[order]
+        keep = np.r_[True, (rows[1:] != rows[:-1])
+                     | (block[1:] != block[:-1])][:len(rows)]
+        rows, block = rows[keep], block[keep]
+        # never ahead of the block just read, so nothing unread is lost
+        indices[written:written + len(block)] = block
+        written += len(block)
+        counts[first:last] = np.bincount(rows, minlength=last - first)
+        first = last
+
+    indptr = np.zeros(nrows + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    if written < len(indices):
+        indices = indices[:written].copy()
+    return indptr, indices
+
+
+def load_stars(path, person_index, movie_index, chunksize=CHUNKSIZE,
+               progress=False):
+    """
+    Reads stars.csv in two passes, and returns the CSR arrays
+    (person_indptr, person_indices, movie_indptr, movie_indices).
+    """
+    npeople, nmovies = len(person_index), len(movie_index)
+
+    # first pass: count stars per person and per movie
+    person_counts = np.zeros(npeople, dtype=np.int64)
+    movie_counts = np.zeros(nmovies, dtype=np.int64)
+    skipped = 0
+    report = Progress(f"{path} (counting)", progress)
+    for chunk in read_chunks(path, chunksize):
+        people, movies = intern_chunk(chunk, person_index, movie_index)
+        skipped += len(chunk) - len(people)
+        person_counts += np.bincount(people, minlength=npeople)
+        movie_counts += np.bincount(movies, minlength=nmovies)
+        report.update(len(chunk))
+    report.done(f", {skipped} rows with unknown ids skipped"
+                if skipped else "")
+
+    person_indptr = np.zeros(npeople + 1, dtype=np.int64)
+    np.cumsum(person_counts, out=person_indptr[1:])
+    movie_indptr = np.zeros(nmovies + 1, dtype=np.int64)
+    np.cumsum(movie_counts, out=movie_indptr[1:])
+    del person_counts, movie_counts
+
+    # second pass: fill the arrays in place
+    person_indices = np.empty(person_indptr[-1], dtype=np.int32)
+    movie_indices = np.empty(movie_indptr[-1], dtype=np.int32)
+    person_cursor = np.zeros(npeople, dtype=np.int64)
+    movie_cursor = np.zeros(nmovies, dtype=np.int64)
+    report = Progress(f"{path} (filling)", progress)
+    for chunk in read_chunks(path, chunksize):
+        people, movies = intern_chunk(chunk, person_index, movie_index)
+        fill_rows(person_indptr, person_indices, person_cursor, people, movies)
+        fill_rows(movie_indptr, movie_indices, movie_cursor, movies, people)
+        report.update(len(chunk))
+    report.done()
+
+    # stars.csv may list the same star twice for a movie, which the
+    # dict backend ignores thanks to its sets
+    person_indptr, person_indices = dedupe_rows(person_indptr, person_indices)
+    movie_indptr, movie_indices = dedupe_rows(movie_indptr, movie_indices)
+    return person_indptr, person_indices, movie_indptr, movie_indices
@@ -0,0 +1,125 @@
+"""
+Fuzzy and prefix name lookup for degrees.py.
+
+NameSearch keeps the distinct lowercase names sorted, which gives
+autocompletion by binary search, and an inverted index from character
+trigrams to the names containing them, which gives fuzzy matching:
+the names sharing the most trigrams with the query are the candidates,
+and they are ranked by their (bounded) edit distance to the query.
+
+Only the rarest trigrams of a query are looked up, up to
+POSTINGS_BUDGET names in total, so a query costs about the same on
+millions of names as on thousands.
+
+Building the index takes seconds per million names, so degrees.py
+builds it in load_data, and the csr snapshot stores it (see
+snapshot.py) to be memory-mapped instead of rebuilt.
+"""
+
+import bisect
+from array import array
+from collections import Counter
+
+# upper bound on the number of posting entries counted per query
+POSTINGS_BUDGET = 10000
+
+# number of best trigram matches whose edit distance gets computed
+CANDIDATES = 100
+
+
+def trigrams(name):
+    """Returns the set of character trigrams of name, padded with spaces."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, bound):
+    """
+    Returns the Levenshtein distance between a and b, or None if it is
+    larger than bound.
+    """
+    if abs(len(a) - len(b)) > bound:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        # every later row is at least the smallest entry of this one
+        if min(current) > bound:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= bound else None
+
+
+class NameSearch():
+
+    def __init__(self, names):
+        # distinct lowercase names, sorted, and for each trigram the
+        # positions in that list of the names containing it
+        self.names = sorted(set(name.lower() for name in names))
+        self.postings = {}
+        for i, name in enumerate(self.names):
+            for gram in trigrams(name):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array("i")
+                posting.append(i)
+
+    @classmethod
+    def from_postings(cls, names, postings):
+        """
+        Returns a NameSearch on an index built before: names is the
+        sorted sequence of distinct lowercase names, and postings maps
+        each trigram to the sequence of positions in names of the names
+        containing it.
+        """
+        search = cls.__new__(cls)
+        search.names = names
+        search.postings = postings
+        return search
+
+    def autocomplete(self, prefix, limit=10):
+        """Returns up to limit names starting with prefix, in order."""
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.names, prefix)
+        matches = []
+        for k in range(start, min(start + limit, len(self.names))):
+            name = self.names[k]
+            if not name.startswith(prefix):
+                break
+            matches.append(name)
+        return matches
+
+    def search(self, query, limit=10, max_distance=None):
+        """
+        Returns up to limit (distance, name) pairs for the names closest
+        to query, closest first.  Only names within max_distance edits
+        are returned; by default that is about one edit per four
+        characters of query.
+        """
+        query = query.lower()
+        if max_distance is None:
+            max_distance = max(1, len(query) // 4)
+
+        # count shared trigrams, starting with the most selective ones
+        postings = sorted((self.postings[gram] for gram in trigrams(query)
+                           if gram in self.postings), key=len)
+        counts = Counter()
+        used = 0
+        for posting in postings:
+            if counts and used + len(posting) > POSTINGS_BUDGET:
+                break
+            counts.update(posting)
+            used += len(posting)
+
+        results = []
+        for i, _ in counts.most_common(CANDIDATES):
+            name = self.names[i]
+            distance = edit_distance(query, name, max_distance)
+            if distance is not None:
+                results.append((distance, name))
+        results.sort()
+        return results[:limit]
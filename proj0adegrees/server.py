@@ -0,0 +1,239 @@
+"""
+Long-running degrees query server.
+
+Usage: python server.py [directory] [port]
+
+Loads the dataset once (with the csr backend, see graph.py), then
+answers HTTP requests on localhost:
+
+    GET /path?source=Kevin+Bacon&target=Tom+Hanks
+    GET /stats
+
+source and target may be names or person ids.  Ambiguous names get a
+300 response listing the candidate ids.  The answer is JSON:
+
+    {"degrees": 1, "path": [{"movie": ..., "title": ...,
+                             "person": ..., "name": ...}]}
+
+Searches run in a thread pool, so several requests are answered
+concurrently.  Recent paths are kept in an LRU cache, and so are
+complete BFS trees of the sources that have been asked for more than
+once, so that any query from a popular source (Kevin Bacon, say) is
+just a walk up a parent array.
+"""
+
+import asyncio
+import json
+import sys
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import degrees
+
+# how many times a source has to be queried before we pay for a full
+# BFS tree from it
+TREE_THRESHOLD = 2
+
+
+class LRUCache():
+    """
+    Dict-like cache holding at most maxsize items, evicting the least
+    recently used one first.  Safe to share between threads.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def stats(self):
+        return {"size": len(self.items), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses}
+
+
+class DegreesService():
+    """
+    Answers shortest path queries on the loaded degrees.graph, with
+    caches for paths and BFS trees.
+    """
+
+    def __init__(self, path_cache_size=4096, tree_cache_size=8):
+        self.graph = degrees.graph
+        self.paths = LRUCache(path_cache_size)
+        self.trees = LRUCache(tree_cache_size)
+        self.source_counts = LRUCache(path_cache_size)
+
+        # searches in progress, so that identical concurrent queries
+        # wait for the same search instead of starting their own
+        self.pending = {}
+
+    def resolve(self, query):
+        """
+        Returns the list of person ids matching query, which is
+        a person id or a name.
+        """
+        if query in degrees.people:
+            return [query]
+        return sorted(degrees.names.get(query.lower(), set()))
+
+    def search(self, source, target):
+        """
+        Returns the shortest path from source to target (both person ids),
+        using the caches when possible.  Runs in a worker thread.
+        """
+        path = self.paths.get((source, target), False)
+        if path is not False:
+            return path
+
+        tree = self.trees.get(source)
+        if tree is None and source != target:
+            count = self.source_counts.get(source, 0) + 1
+            self.source_counts.put(source, count)
+            if count >= TREE_THRESHOLD:
+                tree = self.graph.bfs_tree(self.graph.person_index[source])
+                self.trees.put(source, tree)
+
+        if tree is not None and source != target:
+            path = self.graph.tree_path(tree, target)
+        else:
+            path = self.graph.shortest_path(source, target)
+        self.paths.put((source, target), path)
+        return path
+
+    async def shortest_path(self, source, target):
+        key = (source, target)
+        if key not in self.pending:
+            loop = asyncio.get_running_loop()
+            self.pending[key] = loop.run_in_executor(
+                None, self.search, source, target)
+        try:
+            return await asyncio.shield(self.pending[key])
+        finally:
+            if key in self.pending and self.pending[key].done():
+                del self.pending[key]
+
+    def describe(self, path):
+        """Returns the JSON-friendly version of path."""
+        if path is None:
+            return {"degrees": None, "path": None}
+        graph = self.graph
+        return {
+            "degrees": len(path),
+            "path": [{"movie": movie_id,
+                      "title": graph.movie_titles[graph.movie_index[movie_id]],
+                      "person": person_id,
+                      "name": graph.person_names[graph.person_index[person_id]]}
+                     for movie_id, person_id in path]
+        }
+
+    async def handle(self, reader, writer):
+        """Handles a single HTTP request on a connection."""
+        try:
+            request = await reader.readline()
+            # skip the headers, we don't need any of them
+            while (await reader.readline()).strip():
+                pass
+            try:
+                method, target, _ = request.decode("latin-1").split(" ", 2)
+            except ValueError:
+                status, body = 400, {"error": "bad request"}
+            else:
+                status, body = await self.route(method, target)
+            payload = json.dumps(body).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + payload)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def route(self, method, target):
+        """Returns (status, body) for a request."""
+        if method != "GET":
+            return 405, {"error": "only GET is supported"}
+        url = urlsplit(target)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/stats":
+            return 200, {"paths": self.paths.stats(),
+                         "trees": self.trees.stats()}
+
+        if url.path == "/path":
+            ids = []
+            for param in ("source", "target"):
+                if param not in params:
+                    return 400, {"error": f"missing {param}"}
+                matches = self.resolve(params[param])
+                if len(matches) == 0:
+                    return 404, {"error": f"{params[param]} not found"}
+                if len(matches) > 1:
+                    return 300, {"error": f"which {params[param]}?",
+                                 "candidates": [
+                                     {"person": pid,
+                                      "birth": degrees.people[pid]["birth"]}
+                                     for pid in matches]}
+                ids.append(matches[0])
+            path = await self.shortest_path(*ids)
+            return 200, self.describe(path)
+
+        return 404, {"error": f"no such endpoint {url.path}"}
+
+
+REASONS = {200: "OK", 300: "Multiple Choices", 400: "Bad Request",
+           404: "Not Found", 405: "Method Not Allowed"}
+
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python server.py [directory] [port]")
+    directory = sys.argv[1] if len(sys.argv) > 1 else "large"
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8000
+
+    print("Loading data...")
+    degrees.load_data(directory, backend="csr")
+    print("Data loaded.")
+
+    try:
+        asyncio.run(serve(DegreesService(), "127.0.0.1", port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
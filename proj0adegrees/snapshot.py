@@ -0,0 +1,343 @@
+"""
+Binary snapshot cache for the compact graph backend of degrees.py.
+
+Parsing the CSV files dominates startup on the large dataset, so the
+first time a directory is loaded with the csr backend we write every
+array of the graph.Graph as a .npy file in a .snapshot directory next
+to the CSVs.  Later runs memory-map those files instead, which takes
+milliseconds; pages are only read from disk when a search touches them.
+
+Strings (ids, names, titles, ...) are stored as one UTF-8 byte array
+plus an offsets array, and the id -> index and name -> ids lookups are
+binary searches over precomputed sort orders, so nothing has to be
+rebuilt in Python at load time.  The trigram index of nameindex.py is
+stored the same way, its postings as one array with offsets.
+
+meta.json records SNAPSHOT_VERSION and the size, mtime and SHA-1 of each
+CSV file.  The snapshot is rebuilt when the version or the contents of
+a CSV change; a CSV whose mtime changed but whose hash didn't (say,
+after a fresh checkout) only gets its recorded mtime refreshed.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Mapping
+
+import numpy as np
+
+from graph import Graph
+from nameindex import NameSearch
+
+# Bump this whenever the layout of the snapshot files changes
+SNAPSHOT_VERSION = 2
+
+SNAPSHOT_DIR = ".snapshot"
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+ARRAYS = ["person_indptr", "person_indices", "movie_indptr", "movie_indices"]
+STRINGS = ["person_ids", "person_names", "person_births",
+           "movie_ids", "movie_titles", "movie_years"]
+SEARCH_STRINGS = ["search_names", "search_grams"]
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as a byte array and offsets,
+    string i being data[offsets[i]:offsets[i+1]] decoded as UTF-8.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class SortedKeys():
+    """
+    The sequence key(table[order[k]]) for k = 0, 1, ..., which is sorted
+    when order is, so that it can be handed to bisect.
+    """
+
+    def __init__(self, table, order, key=None):
+        self.table = table
+        self.order = order
+        self.key = key
+
+    def __getitem__(self, k):
+        value = self.table[int(self.order[k])]
+        return value if self.key is None else self.key(value)
+
+    def __len__(self):
+        return len(self.order)
+
+
+class SortedIndex(Mapping):
+    """
+    Read-only dict mapping each string of a StringTable to its index,
+    given the permutation that sorts the table.
+    """
+
+    def __init__(self, table, order):
+        self.order = order
+        self.sorted_keys = SortedKeys(table, order)
+
+    def __getitem__(self, key):
+        k = bisect.bisect_left(self.sorted_keys, key)
+        if k == len(self.sorted_keys) or self.sorted_keys[k] != key:
+            raise KeyError(key)
+        return int(self.order[k])
+
+    def __iter__(self):
+        for k in range(len(self.sorted_keys)):
+            yield self.sorted_keys[k]
+
+    def __len__(self):
+        return len(self.order)
+
+
+class NameIndex(Mapping):
+    """
+    Read-only dict with the same shape as degrees.names, mapping
+    lowercase names to the set of person ids with that name.
+    """
+
+    def __init__(self, graph, order):
+        self.graph = graph
+        self.order = order
+        self.sorted_keys = SortedKeys(graph.person_names, order, key=str.lower)
+
+    def __getitem__(self, name):
+        start = bisect.bisect_left(self.sorted_keys, name)
+        end = bisect.bisect_right(self.sorted_keys, name)
+        if start == end:
+            raise KeyError(name)
+        return {self.graph.person_ids[int(i)] for i in self.order[start:end]}
+
+    def __iter__(self):
+        previous = None
+        for k in range(len(self.sorted_keys)):
+            name = self.sorted_keys[k]
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class PostingsIndex(Mapping):
+    """
+    Read-only dict mapping each trigram of a nameindex.NameSearch to its
+    positions, given the sorted trigrams as a StringTable and the
+    positions of trigram k as positions[offsets[k]:offsets[k+1]].
+    """
+
+    def __init__(self, grams, offsets, positions):
+        self.grams = grams
+        self.offsets = offsets
+        self.positions = positions
+
+    def __getitem__(self, gram):
+        k = bisect.bisect_left(self.grams, gram)
+        if k == len(self.grams) or self.grams[k] != gram:
+            raise KeyError(gram)
+        # a memoryview iterates as plain ints, much faster than NumPy scalars
+        return memoryview(self.positions[self.offsets[k]:self.offsets[k + 1]])
+
+    def __iter__(self):
+        return iter(self.grams)
+
+    def __len__(self):
+        return len(self.grams)
+
+
+def save_strings(path, name, strings):
+    """Saves the strings as the StringTable name in the directory path."""
+    if not isinstance(strings, StringTable):
+        strings = StringTable.from_strings(strings)
+    np.save(os.path.join(path, f"{name}.data.npy"), strings.data)
+    np.save(os.path.join(path, f"{name}.offsets.npy"), strings.offsets)
+
+
+def fingerprint(path, with_hash=True):
+    """Returns the size, mtime and (optionally) SHA-1 of the file at path."""
+    stat = os.stat(path)
+    result = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        sha1 = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(block)
+        result["sha1"] = sha1.hexdigest()
+    return result
+
+
+def is_fresh(directory, meta):
+    """
+    Returns True if the snapshot described by meta is up to date with the
+    CSV files in directory.  Hashes are only computed for the files whose
+    size and mtime don't match, and meta is updated in place when such
+    a file turns out to be unchanged.
+    """
+    if meta.get("version") != SNAPSHOT_VERSION:
+        return False
+    for name in SOURCES:
+        recorded = meta["sources"].get(name)
+        current = fingerprint(os.path.join(directory, name), with_hash=False)
+        if recorded is None or recorded["size"] != current["size"]:
+            return False
+        if recorded["mtime_ns"] != current["mtime_ns"]:
+            current = fingerprint(os.path.join(directory, name))
+            if recorded["sha1"] != current["sha1"]:
+                return False
+            meta["sources"][name] = current
+            meta["touched"] = True
+    return True
+
+
+def write_snapshot(directory, graph, name_search):
+    """
+    Writes graph and the nameindex.NameSearch on its names as a snapshot
+    of the CSV files in directory.
+    """
+    final = os.path.join(directory, SNAPSHOT_DIR)
+    tmp = final + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for name in ARRAYS:
+        np.save(os.path.join(tmp, f"{name}.npy"), getattr(graph, name))
+    for name in STRINGS:
+        save_strings(tmp, name, getattr(graph, name))
+
+    # the trigram index, postings in trigram order
+    grams = sorted(name_search.postings)
+    postings = [name_search.postings[gram] for gram in grams]
+    offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+    np.cumsum([len(posting) for posting in postings], out=offsets[1:])
+    positions = np.empty(offsets[-1], dtype=np.int32)
+    for posting, start in zip(postings, offsets.tolist()):
+        positions[start:start + len(posting)] = posting
+    save_strings(tmp, "search_names", name_search.names)
+    save_strings(tmp, "search_grams", grams)
+    np.save(os.path.join(tmp, "search_offsets.npy"), offsets)
+    np.save(os.path.join(tmp, "search_positions.npy"), positions)
+
+    # sort orders for the id and name lookups
+    orders = {
+        "person_order": sorted(range(len(graph.person_ids)),
+                               key=graph.person_ids.__getitem__),
+        "movie_order": sorted(range(len(graph.movie_ids)),
+                              key=graph.movie_ids.__getitem__),
+        "name_order": sorted(range(len(graph.person_names)),
+                             key=lambda i: graph.person_names[i].lower()),
+    }
+    for name, order in orders.items():
+        np.save(os.path.join(tmp, f"{name}.npy"),
+                np.array(order, dtype=np.int32))
+
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "sources": {name: fingerprint(os.path.join(directory, name))
+                    for name in SOURCES},
+    }
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # swap the new snapshot in only once it is complete
+    shutil.rmtree(final, ignore_errors=True)
+    os.rename(tmp, final)
+
+
+def load_snapshot(directory):
+    """
+    Returns (graph, names, name_search) memory-mapped from the snapshot
+    in directory, or None if there is no up to date snapshot.
+    """
+    path = os.path.join(directory, SNAPSHOT_DIR)
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if not is_fresh(directory, meta):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+
+    def load(name):
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+    # a missing, truncated or otherwise unreadable file means rebuilding
+    try:
+        strings = {name: StringTable(load(f"{name}.data"),
+                                     load(f"{name}.offsets"))
+                   for name in STRINGS + SEARCH_STRINGS}
+        graph = Graph(
+            strings["person_ids"], strings["person_names"],
+            strings["person_births"], strings["movie_ids"],
+            strings["movie_titles"], strings["movie_years"],
+            *[load(name) for name in ARRAYS],
+            person_index=SortedIndex(strings["person_ids"],
+                                     load("person_order")),
+            movie_index=SortedIndex(strings["movie_ids"], load("movie_order")))
+        names = NameIndex(graph, load("name_order"))
+        name_search = NameSearch.from_postings(
+            strings["search_names"],
+            PostingsIndex(strings["search_grams"], load("search_offsets"),
+                          load("search_positions")))
+    except (OSError, ValueError):
+        return None
+
+    # record the refreshed mtimes, so we don't hash again next time
+    if meta.pop("touched", False):
+        try:
+            with open(os.path.join(path, "meta.json"), "w") as f:
+                json.dump(meta, f, indent=2)
+        except OSError:
+            pass
+    return graph, names, name_search
+
+
+def load_or_build(directory, progress=False):
+    """
+    Returns (graph, names, name_search) for the CSV files in directory,
+    from the snapshot if it is up to date, and from the CSVs otherwise,
+    in which case the snapshot is (re)written.
+    """
+    loaded = load_snapshot(directory)
+    if loaded is not None:
+        return loaded
+
+    graph = Graph.from_csv(directory, progress=progress)
+    name_search = NameSearch(graph.person_names)
+    try:
+        write_snapshot(directory, graph, name_search)
+    except OSError as e:
+        # a read-only dataset is fine, we just won't be any faster next time
+        print(f"Could not write snapshot: {e}")
+        return graph, None, name_search
+    # the snapshot just written can still fail to load, say if another
+    # process is rewriting it; what was built from the CSVs will do
+    loaded = load_snapshot(directory)
+    if loaded is None:
+        return graph, None, name_search
+    return loaded
@@ -0,0 +1,41 @@
+import shutil
+
+import degrees
+
+
+def copy_with_blank_lines(tmp_path):
+    directory = tmp_path / "small"
+    shutil.copytree("small", directory)
+    for name in ["people.csv", "movies.csv", "stars.csv"]:
+        with open(directory / name, "a", encoding="utf-8") as f:
+            f.write("\n\n")
+    return directory
+
+
+def loaded():
+    """Returns plain dict copies of what degrees has loaded."""
+    return ({pid: dict(person) for pid, person in degrees.people.items()},
+            {mid: dict(movie) for mid, movie in degrees.movies.items()},
+            {name: set(ids) for name, ids in degrees.names.items()})
+
+
+def test_trailing_blank_lines(tmp_path):
+    directory = copy_with_blank_lines(tmp_path)
+
+    degrees.load_data(directory, backend="dict")
+    expected = loaded()
+    assert len(expected[0]) > 0
+
+    degrees.load_data(directory, backend="csr", snapshot=False)
+    assert loaded() == expected
+
+
+def test_switching_backends(tmp_path):
+    directory = copy_with_blank_lines(tmp_path)
+
+    degrees.load_data(directory, backend="dict")
+    expected = loaded()
+    for backend in ["csr", "dict", "csr"]:
+        degrees.load_data(directory, backend=backend)
+        assert loaded() == expected
+        assert (degrees.graph is None) == (backend == "dict")
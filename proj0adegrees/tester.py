@@ -1,13 +1,63 @@
+"""
+Computes the diameter, eccentricities and connected components of the
+degrees graph, with one breadth-first search per person spread over
+a process pool (see allpairs.py).
 
-load_data('small')
-longest = 0
-
-for p1 in people.keys():
-    for p2 in people.keys():
-        path = shortest_path(p1, p2)
-        if not path:
-            print('no path from %s to %s' % (people[p1]['name'], people[p2]['name']))
-        elif len(path)> longest:
-            longest = len(path)
-            pair = (p1,p2)
-print('The diameter of the graph is %i.  The two people who are furthest apart are %s and %s' % (longest, people[pair[0]]['name'], people[pair[1]]['name']))
+Usage: python tester.py [directory] [processes] [sample]
+
+If sample is given, only that many randomly chosen people are used as
+sources, which gives a lower bound on the diameter in much less time
+on the large dataset.
+"""
+
+import random
+import sys
+
+import degrees
+from allpairs import graph_stats
+
+
+def main():
+    if len(sys.argv) > 4:
+        sys.exit("Usage: python tester.py [directory] [processes] [sample]")
+    directory = sys.argv[1] if len(sys.argv) > 1 else "small"
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    sample = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    print("Loading data...")
+    degrees.load_data(directory, backend="csr")
+    print("Data loaded.")
+    graph = degrees.graph
+
+    sources = None
+    if sample is not None:
+        npeople = len(graph.person_ids)
+        sources = random.Random(0).sample(range(npeople), min(sample, npeople))
+
+    stats = graph_stats(graph, sources, processes)
+
+    def name(person):
+        return degrees.people[graph.person_ids[person]]["name"]
+
+    if stats["pair"] is None:
+        # no sources were searched (sample 0)
+        print("No people sampled, so no diameter.")
+    else:
+        p1, p2 = stats["pair"]
+        print('The diameter of the graph is %i.  The two people who are '
+              'furthest apart are %s and %s'
+              % (stats["diameter"], name(p1), name(p2)))
+
+    print('There are %i connected components, the largest ones having '
+          'sizes %s' % (stats["components"], stats["component_sizes"][:10]))
+
+    print("Eccentricities:")
+    counts = {}
+    for ecc in stats["eccentricity"].values():
+        counts[ecc] = counts.get(ecc, 0) + 1
+    for ecc in sorted(counts):
+        print(f"    {ecc}: {counts[ecc]} people")
+
+
+if __name__ == "__main__":
+    main()
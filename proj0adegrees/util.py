@@ -1,4 +1,10 @@
+from array import array
+
+
 class Node():
+    # there are a lot of these during a search, so no per-instance __dict__
+    __slots__ = ("state", "parent", "action")
+
     def __init__(self, state, parent, action):
         self.state = state
         self.parent = parent
@@ -49,3 +55,67 @@ class QueueFrontier(StackFrontier):
             node = self.frontier.popleft()
             self.frontierset.remove(node.state)
             return node
+
+
+class ArrayFrontier():
+    """
+    Breadth-first frontier for integer states 0, 1, ..., size - 1 that
+    doesn't allocate anything per state.
+
+    Instead of Nodes, it keeps a parent and an action for every state in
+    preallocated arrays, and instead of a set, a bitmap of the states
+    ever added (so contains_state covers the explored set as well).
+    Every state is added at most once, so the queue is an array of
+    size entries that is never wrapped around.
+
+    clear() only resets the states actually added, so one frontier can
+    be reused for many searches on the same graph.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.parent = array("q", [-1]) * size
+        self.action = array("q", [-1]) * size
+        self.visited = bytearray((size + 7) // 8)
+        self.queue = array("q", [0]) * size
+        self.head = 0
+        self.tail = 0
+
+    def add(self, state, parent=-1, action=-1):
+        self.visited[state >> 3] |= 1 << (state & 7)
+        self.parent[state] = parent
+        self.action[state] = action
+        self.queue[self.tail] = state
+        self.tail += 1
+
+    def contains_state(self, state):
+        return self.visited[state >> 3] >> (state & 7) & 1
+
+    def empty(self):
+        return self.head == self.tail
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        state = self.queue[self.head]
+        self.head += 1
+        return state
+
+    def path(self, state):
+        """
+        Returns the list of (action, state) pairs leading from the first
+        state added to state.
+        """
+        path = []
+        while self.parent[state] >= 0:
+            path.append((self.action[state], state))
+            state = self.parent[state]
+        path.reverse()
+        return path
+
+    def clear(self):
+        queue, visited = self.queue, self.visited
+        for i in range(self.tail):
+            visited[queue[i] >> 3] = 0
+        self.head = 0
+        self.tail = 0
@@ -0,0 +1,86 @@
+"""
+Benchmarks the tic-tac-toe engine on a full-tree minimax from the
+empty board, i.e. without any pruning, visiting all 549946 nodes of
+the game tree.
+
+Usage: python benchmark.py
+
+The search is run once through the nested list functions of
+tictactoe.py, and once directly on bitboards, and both report nodes
+per second.  We also time the first move from the empty board, which
+is the move runner.py waits for when the AI plays first, with the
+plain bitboard search, with a cold and a warm transposition table, and
+from the opening book (which is what tictactoe.minimax uses).
+
+Finally, the alpha-beta engine of mnk.py searches the empty 4 x 4
+board (4 in a row) and Connect Four for two seconds each, and prints
+its node count report.
+"""
+
+import time
+
+import bitboard as bb
+import tictactoe as ttt
+from book import Book
+from mnk import MNKGame
+from transposition import TranspositionTable
+
+
+def full_minimax_lists(board, counter):
+    counter[0] += 1
+    if ttt.terminal(board):
+        return ttt.utility(board)
+    values = [full_minimax_lists(ttt.result(board, action), counter)
+              for action in ttt.actions(board)]
+    return max(values) if ttt.player(board) == ttt.X else min(values)
+
+
+def full_minimax_bits(x, o, counter):
+    counter[0] += 1
+    if bb.terminal(x, o):
+        return bb.utility(x, o)
+    values = [full_minimax_bits(*bb.result(x, o, move), counter)
+              for move in bb.actions(x, o)]
+    return max(values) if bb.player(x, o) == bb.X_TURN else min(values)
+
+
+def timed(label, function, *args):
+    counter = [0]
+    start = time.perf_counter()
+    value = function(*args, counter)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>8}: value {value}, {counter[0]} nodes, {elapsed:.3f}s, "
+          f"{counter[0] / elapsed:,.0f} nodes/s")
+
+
+def main():
+    timed("lists", full_minimax_lists, ttt.initial_state())
+    timed("bitboard", full_minimax_bits, 0, 0)
+
+    start = time.perf_counter()
+    move = bb.minimax(0, 0)
+    elapsed = time.perf_counter() - start
+    print(f"first move, no table: {bb.to_action(move)} in {elapsed:.4f}s")
+
+    table = TranspositionTable()
+    for label in ["cold", "warm"]:
+        start = time.perf_counter()
+        move = table.best_move(0, 0)
+        elapsed = time.perf_counter() - start
+        print(f"first move, {label} table: {bb.to_action(move)} in "
+              f"{elapsed:.4f}s, {table.stats()}")
+
+    book = Book()
+    book.load()
+    start = time.perf_counter()
+    move, _ = book.lookup(0, 0)
+    elapsed = time.perf_counter() - start
+    print(f"first move, book: {bb.to_action(move)} in {elapsed:.6f}s")
+
+    for label, game in [("4,4,4", MNKGame(4, 4, 4)),
+                        ("connect four", MNKGame(6, 7, 4, gravity=True))]:
+        print(f"{label}: {game.search((0, 0), time_limit=2.0)}")
+
+
+if __name__ == "__main__":
+    main()
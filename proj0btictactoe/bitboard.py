@@ -0,0 +1,171 @@
+"""
+Bitboard tic-tac-toe engine.
+
+A board is a pair of 9-bit integers (x, o), bit 3 * i + j being set
+when X (respectively O) has played in row i, column j.  Everything that
+tictactoe.py computes by walking nested lists becomes a table lookup
+or a couple of bit operations:
+
+    WINNING[mask] is True if mask contains three in a row,
+    POPCOUNT[mask] is the number of bits set in mask,
+
+so player, winner and terminal are O(1).
+"""
+
+FULL = 0b111111111
+
+# the 8 lines: rows, columns and diagonals
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,
+    0b001001001, 0b010010010, 0b100100100,
+    0b100010001, 0b001010100,
+)
+
+WINNING = tuple(any(mask & line == line for line in WIN_MASKS)
+                for mask in range(FULL + 1))
+POPCOUNT = tuple(bin(mask).count("1") for mask in range(FULL + 1))
+
+# MOVES[empty] lists the single-bit moves of the empty-cell mask empty,
+# so actions don't have to scan the board either
+MOVES = tuple(tuple(1 << k for k in range(9) if mask >> k & 1)
+              for mask in range(FULL + 1))
+
+X_TURN = 1
+O_TURN = -1
+
+
+def from_lists(board):
+    """Returns the (x, o) bitboard of a nested list board."""
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == "X":
+                x |= 1 << (3 * i + j)
+            elif cell == "O":
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def to_lists(x, o, X="X", O="O", EMPTY=None):
+    """Returns the nested list board of the bitboard (x, o)."""
+    return [[X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1
+             else EMPTY for j in range(3)] for i in range(3)]
+
+
+def to_action(move):
+    """Returns the (i, j) action of a single-bit move."""
+    k = move.bit_length() - 1
+    return divmod(k, 3)
+
+
+def to_move(action):
+    """Returns the single-bit move of an (i, j) action."""
+    i, j = action
+    return 1 << (3 * i + j)
+
+
+def player(x, o):
+    """Returns X_TURN or O_TURN."""
+    return O_TURN if POPCOUNT[x] > POPCOUNT[o] else X_TURN
+
+
+def actions(x, o):
+    """Returns the tuple of single-bit moves available."""
+    return MOVES[FULL & ~(x | o)]
+
+
+def result(x, o, move):
+    """Returns the bitboard after the player to move plays move."""
+    if (x | o) & move:
+        raise ValueError("Invalid action")
+    if POPCOUNT[x] > POPCOUNT[o]:
+        return x, o | move
+    return x | move, o
+
+
+def winner(x, o):
+    """Returns X_TURN or O_TURN for the winner, or 0."""
+    if WINNING[x]:
+        return X_TURN
+    if WINNING[o]:
+        return O_TURN
+    return 0
+
+
+def terminal(x, o):
+    return WINNING[x] or WINNING[o] or (x | o) == FULL
+
+
+def utility(x, o):
+    """Returns 1 if X has won the game, -1 if O has won, 0 otherwise."""
+    return winner(x, o)
+
+
+def minimax(x, o, counter=None):
+    """
+    Returns the optimal single-bit move for the player to move,
+    or None on a terminal board.
+
+    Same search as tictactoe.minimax: take the first winning move
+    found, otherwise the best one.  If counter is a list, counter[0]
+    is increased by the number of positions searched.
+    """
+    if terminal(x, o):
+        return None
+
+    best_move, best_value = None, None
+    if player(x, o) == X_TURN:
+        for move in actions(x, o):
+            value = min_value(x | move, o, counter)
+            if value == 1:
+                return move
+            if best_value is None or value > best_value:
+                best_move, best_value = move, value
+    else:
+        for move in actions(x, o):
+            value = max_value(x, o | move, counter)
+            if value == -1:
+                return move
+            if best_value is None or value < best_value:
+                best_move, best_value = move, value
+    return best_move
+
+
+def max_value(x, o, counter=None):
+    """Value of a board with X to move, stopping at the first win found."""
+    if counter is not None:
+        counter[0] += 1
+    if WINNING[x]:
+        return 1
+    if WINNING[o]:
+        return -1
+    if (x | o) == FULL:
+        return 0
+    v = -2
+    for move in MOVES[FULL & ~(x | o)]:
+        value = min_value(x | move, o, counter)
+        if value == 1:
+            return 1
+        if value > v:
+            v = value
+    return v
+
+
+def min_value(x, o, counter=None):
+    """Value of a board with O to move, stopping at the first win found."""
+    if counter is not None:
+        counter[0] += 1
+    if WINNING[x]:
+        return 1
+    if WINNING[o]:
+        return -1
+    if (x | o) == FULL:
+        return 0
+    v = 2
+    for move in MOVES[FULL & ~(x | o)]:
+        value = max_value(x, o | move, counter)
+        if value == -1:
+            return -1
+        if value < v:
+            v = value
+    return v
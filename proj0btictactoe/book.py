@@ -0,0 +1,127 @@
+"""
+Perfect-play opening book for tic-tac-toe.
+
+The game tree is small enough to solve completely, so we do it once
+and store the answer for every reachable position in a file, one byte
+per position.  A position is indexed by reading its 9 cells as base 3
+digits (0 empty, 1 X, 2 O), so there are 3**9 = 19683 entries:
+
+    low 4 bits:  best cell 3 * i + j, or NO_MOVE on terminal boards
+    next 2 bits: value + 1 (0 O wins, 1 draw, 2 X wins)
+
+and UNKNOWN for the indices of unreachable boards.  The file is
+memory-mapped the first time it is needed, so a lookup is one byte read.
+
+Usage: python book.py [path]
+
+builds the book (by default BOOK_FILE, next to this file).  Book.lookup
+also builds it the first time if it is missing.
+"""
+
+import mmap
+import os
+import sys
+
+import bitboard as bb
+from transposition import TranspositionTable
+
+BOOK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "book.bin")
+
+# first bytes of a book file; bump the digit when the layout changes
+MAGIC = b"TTTBOOK1"
+
+NO_MOVE = 15
+UNKNOWN = 0xFF
+
+# TERNARY[mask] is the sum of 3**k over the bits k set in mask
+TERNARY = tuple(sum(3 ** k for k in range(9) if mask >> k & 1)
+                for mask in range(bb.FULL + 1))
+
+
+def position_index(x, o):
+    """Returns the book index of the bitboard (x, o)."""
+    return TERNARY[x] + 2 * TERNARY[o]
+
+
+def solve():
+    """Returns the book contents (without MAGIC) as a bytearray."""
+    entries = bytearray([UNKNOWN]) * 3 ** 9
+    table = TranspositionTable()
+    stack = [(0, 0)]
+    while stack:
+        x, o = stack.pop()
+        index = position_index(x, o)
+        if entries[index] != UNKNOWN:
+            continue
+        move = table.best_move(x, o)
+        value = table.value(x, o)
+        cell = NO_MOVE if move is None else move.bit_length() - 1
+        entries[index] = cell | (value + 1) << 4
+        if move is not None:
+            for move in bb.actions(x, o):
+                stack.append(bb.result(x, o, move))
+    return entries
+
+
+def build(path=BOOK_FILE):
+    """Solves the game and writes the book to path."""
+    entries = solve()
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(entries)
+    os.replace(tmp, path)
+
+
+class Book():
+    """
+    Lazily loaded opening book.  Nothing is read until the first lookup.
+    """
+
+    def __init__(self, path=BOOK_FILE):
+        self.path = path
+        self.data = None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            try:
+                build(self.path)
+            except OSError:
+                # can't write next to the code; keep the book in memory
+                self.data = MAGIC + solve()
+                return
+        with open(self.path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:len(MAGIC)] != MAGIC:
+            data.close()
+            raise ValueError(f"{self.path} is not a tic-tac-toe book, "
+                             f"delete it to rebuild it")
+        self.data = data
+
+    def lookup(self, x, o):
+        """
+        Returns (move, value) for the bitboard (x, o), move being a
+        single-bit move (None on terminal boards) and value 1, 0 or -1.
+        Raises KeyError for boards that can't be reached in a game.
+        """
+        if self.data is None:
+            self.load()
+        entry = self.data[len(MAGIC) + position_index(x, o)]
+        if entry == UNKNOWN:
+            raise KeyError((x, o))
+        cell = entry & 0xF
+        move = None if cell == NO_MOVE else 1 << cell
+        return move, (entry >> 4) - 1
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python book.py [path]")
+    path = sys.argv[1] if len(sys.argv) == 2 else BOOK_FILE
+    build(path)
+    print(f"Wrote {path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Generalized m,n,k-game engine: an m x n board, and the first player
+to get k in a row (horizontally, vertically or diagonally) wins.
+Tic-tac-toe is the 3,3,3-game, gomoku is 15,15,5, and with gravity
+(pieces drop to the lowest empty cell of their column) 6,7,4 is
+Connect Four.
+
+Boards are bitboards like in bitboard.py, just wider: two Python
+integers with bit r * cols + c for row r, column c.
+
+The search is a negamax alpha-beta with a transposition table and
+iterative deepening.  Moves are ordered with the best move of the
+previous iteration first (from the table), then by distance to the
+centre.  When the time budget runs out, the best move of the deepest
+completed iteration is played; the same happens when the optional
+stop event passed to search is set, so a caller running the search in
+a background thread can abandon it.  Positions at the depth limit are
+scored by counting the lines that are still open for each player.
+
+Every search returns a SearchReport with node counts per depth and
+cutoff statistics, so pruning efficiency can be measured.
+"""
+
+import time
+
+# scores of won positions; the ply is subtracted so that quicker wins
+# (and slower losses) are preferred.  The transposition table keeps
+# them counted from the position rather than from the root, see
+# MNKGame.to_table
+WIN = 1000000
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchReport():
+    """Statistics of one call to MNKGame.search."""
+
+    def __init__(self):
+        self.move = None
+        self.value = None
+        self.depth = 0
+        self.nodes = 0
+        self.nodes_per_depth = []
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.table_hits = 0
+        self.elapsed = 0.0
+        self.timed_out = False
+
+    def ordering(self):
+        """
+        Fraction of the cutoffs caused by the first move searched.  The
+        closer to 1, the better the move ordering.
+        """
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 1.0
+
+    def __repr__(self):
+        return (f"SearchReport(move={self.move}, value={self.value}, "
+                f"depth={self.depth}, nodes={self.nodes}, "
+                f"nodes_per_depth={self.nodes_per_depth}, "
+                f"cutoffs={self.cutoffs}, ordering={self.ordering():.2f}, "
+                f"table_hits={self.table_hits}, "
+                f"elapsed={self.elapsed:.3f}s, timed_out={self.timed_out})")
+
+
+class MNKGame():
+
+    def __init__(self, rows=3, cols=3, k=3, gravity=False):
+        if k > max(rows, cols):
+            raise ValueError("k can't be larger than the board")
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.gravity = gravity
+        self.cells = rows * cols
+        self.full = (1 << self.cells) - 1
+
+        # every window of k cells in a row, and for every cell the
+        # windows through it, so a move only checks its own lines
+        self.lines = []
+        for r in range(rows):
+            for c in range(cols):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_r, end_c = r + dr * (k - 1), c + dc * (k - 1)
+                    if 0 <= end_r < rows and 0 <= end_c < cols:
+                        mask = 0
+                        for step in range(k):
+                            mask |= 1 << self.bit(r + dr * step, c + dc * step)
+                        self.lines.append(mask)
+        self.cell_lines = [[line for line in self.lines if line >> cell & 1]
+                           for cell in range(self.cells)]
+
+        # cells sorted from the centre outwards, for move ordering
+        centre_r, centre_c = (rows - 1) / 2, (cols - 1) / 2
+        self.centre_order = sorted(
+            range(self.cells),
+            key=lambda cell: (abs(cell // cols - centre_r)
+                              + abs(cell % cols - centre_c), cell))
+
+        # an open line with n pieces of one player scores line_scores[n]
+        self.line_scores = [0] + [4 ** n for n in range(1, k)]
+
+        # (mine, theirs) -> (depth, value, flag, best cell), kept from one
+        # search to the next until it grows past max_table entries
+        self.table = {}
+        self.max_table = 1000000
+
+    def bit(self, row, col):
+        return row * self.cols + col
+
+    def from_lists(self, board, X="X", O="O"):
+        x = o = 0
+        for r, row in enumerate(board):
+            for c, cell in enumerate(row):
+                if cell == X:
+                    x |= 1 << self.bit(r, c)
+                elif cell == O:
+                    o |= 1 << self.bit(r, c)
+        return x, o
+
+    def to_action(self, cell):
+        return divmod(cell, self.cols)
+
+    def to_move(self, x, o):
+        """Returns 1 if X is to move, -1 otherwise."""
+        return -1 if bin(x).count("1") > bin(o).count("1") else 1
+
+    def is_win(self, mask, cell):
+        """Returns True if the last move, at cell, made a line in mask."""
+        for line in self.cell_lines[cell]:
+            if mask & line == line:
+                return True
+        return False
+
+    def winner(self, x, o):
+        """Returns 1 if X has k in a row, -1 if O has, 0 otherwise."""
+        for line in self.lines:
+            if x & line == line:
+                return 1
+            if o & line == line:
+                return -1
+        return 0
+
+    def terminal(self, x, o):
+        return self.winner(x, o) != 0 or (x | o) == self.full
+
+    def legal_cells(self, x, o):
+        """Returns the playable cells, centre first."""
+        occupied = x | o
+        if not self.gravity:
+            return [cell for cell in self.centre_order
+                    if not occupied >> cell & 1]
+        # with gravity, the lowest empty cell of every column
+        cells = []
+        for col in sorted(range(self.cols),
+                          key=lambda c: abs(c - (self.cols - 1) / 2)):
+            for row in range(self.rows - 1, -1, -1):
+                cell = self.bit(row, col)
+                if not occupied >> cell & 1:
+                    cells.append(cell)
+                    break
+        return cells
+
+    def evaluate(self, mine, theirs):
+        """
+        Heuristic value of a position for the player owning mine:
+        open lines count for whoever has pieces on them.
+        """
+        score = 0
+        scores = self.line_scores
+        for line in self.lines:
+            a = mine & line
+            b = theirs & line
+            if a and not b:
+                score += scores[bin(a).count("1")]
+            elif b and not a:
+                score -= scores[bin(b).count("1")]
+        return score
+
+    def search(self, board, time_limit=1.0, max_depth=None, stop=None):
+        """
+        Searches the position board (a nested list of "X", "O" and None,
+        or an (x, o) bitboard) for at most time_limit seconds, or until
+        stop (a threading.Event) is set, and returns a SearchReport whose
+        move is the (row, col) to play.
+        """
+        x, o = board if isinstance(board, tuple) else self.from_lists(board)
+        if len(self.table) > self.max_table:
+            self.table.clear()
+        report = SearchReport()
+        start = time.perf_counter()
+        deadline = start + time_limit
+        empty = self.cells - bin(x | o).count("1")
+        max_depth = empty if max_depth is None else min(max_depth, empty)
+
+        if self.to_move(x, o) == 1:
+            mine, theirs = x, o
+        else:
+            mine, theirs = o, x
+
+        legal = self.legal_cells(x, o)
+        if self.terminal(x, o) or not legal:
+            report.elapsed = time.perf_counter() - start
+            return report
+
+        for depth in range(1, max_depth + 1):
+            report.nodes_per_depth.append(0)
+            try:
+                value, cell = self.root(mine, theirs, depth, deadline, stop,
+                                        report)
+            except SearchTimeout:
+                report.timed_out = True
+                break
+            report.move = self.to_action(cell)
+            report.value = value
+            report.depth = depth
+            # a forced result is known; searching deeper won't change it
+            if abs(value) >= WIN - self.cells:
+                break
+
+        if report.move is None:
+            # not even depth 1 finished: play the first ordered move
+            report.move = self.to_action(legal[0])
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    def root(self, mine, theirs, depth, deadline, stop, report):
+        best_value, best_cell = -WIN - 1, None
+        alpha, beta = -WIN - 1, WIN + 1
+        for cell in self.ordered(mine, theirs):
+            value = -self.negamax(theirs, mine | 1 << cell, cell, depth - 1,
+                                  -beta, -alpha, 1, deadline, stop, report)
+            if value > best_value:
+                best_value, best_cell = value, cell
+            alpha = max(alpha, value)
+        self.table[(mine, theirs)] = (depth, best_value, EXACT, best_cell)
+        return best_value, best_cell
+
+    def ordered(self, mine, theirs):
+        """Legal cells, the table's best move for this position first."""
+        cells = self.legal_cells(mine, theirs)
+        entry = self.table.get((mine, theirs))
+        if entry is not None and entry[3] in cells:
+            cells.remove(entry[3])
+            cells.insert(0, entry[3])
+        return cells
+
+    def negamax(self, mine, theirs, last, depth, alpha, beta, ply,
+                deadline, stop, report):
+        """
+        Value of the position for the player owning mine, who is to move;
+        theirs has just played at cell last.
+        """
+        report.nodes += 1
+        report.nodes_per_depth[-1] += 1
+        if report.nodes & 1023 == 0 and (time.perf_counter() > deadline or
+                                         stop is not None and stop.is_set()):
+            raise SearchTimeout()
+
+        if self.is_win(theirs, last):
+            return -(WIN - ply)
+        if (mine | theirs) == self.full:
+            return 0
+        if depth == 0:
+            return self.evaluate(mine, theirs)
+
+        original_alpha = alpha
+        key = (mine, theirs)
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            report.table_hits += 1
+            _, value, flag, _ = entry
+            value = self.from_table(value, ply)
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        best_value, best_cell = -WIN - 1, None
+        for i, cell in enumerate(self.ordered(mine, theirs)):
+            value = -self.negamax(theirs, mine | 1 << cell, cell, depth - 1,
+                                  -beta, -alpha, ply + 1, deadline, stop,
+                                  report)
+            if value > best_value:
+                best_value, best_cell = value, cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                report.cutoffs += 1
+                if i == 0:
+                    report.first_move_cutoffs += 1
+                break
+
+        if best_value <= original_alpha:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, self.to_table(best_value, ply), flag,
+                           best_cell)
+        return best_value
+
+    def to_table(self, value, ply):
+        """
+        The value to store for a position at ply: a win or a loss is
+        stored as its distance from the position rather than from the
+        root, so it still holds when the position is reached at another
+        ply.
+        """
+        if value >= WIN - self.cells:
+            return value + ply
+        if value <= -(WIN - self.cells):
+            return value - ply
+        return value
+
+    def from_table(self, value, ply):
+        """The inverse of to_table, for a position reached at ply."""
+        if value >= WIN - self.cells:
+            return value - ply
+        if value <= -(WIN - self.cells):
+            return value + ply
+        return value
@@ -1,9 +1,20 @@
 import pygame
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import tictactoe as ttt
 
+# python runner.py [rows cols k [gravity]] plays on a bigger board,
+# e.g. python runner.py 6 7 4 gravity for Connect Four
+if len(sys.argv) not in [1, 4, 5] or (len(sys.argv) == 5
+                                      and sys.argv[4] != "gravity"):
+    sys.exit("Usage: python runner.py [rows cols k [gravity]]")
+if len(sys.argv) > 1:
+    ttt.configure(int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]),
+                  gravity=len(sys.argv) == 5)
+
 pygame.init()
 size = width, height = 600, 400
 
@@ -15,16 +26,45 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
+
+# Tiles shrink to fit bigger boards on the screen
+tile_size = min(80, (height - 160) // ttt.ROWS, (width - 40) // ttt.COLS)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
+
+clock = pygame.time.Clock()
+
+# The AI move is computed in a background thread, so the window keeps
+# being drawn while it thinks.  (A thread rather than a process: the
+# engine and its transposition table live in this process, and the
+# search gives up the GIL often enough for 60 frames per second.)
+executor = ThreadPoolExecutor(max_workers=1)
+search = None
+stop = None
+search_started = 0
+
+# The AI waits at least this long before playing, so its move doesn't
+# appear the same instant as ours
+AI_DELAY = 0.5
+
+
+def cancel_search():
+    """Abandons the AI search in progress, if any."""
+    global search
+    if search is not None:
+        stop.set()
+        search.cancel()
+        search = None
+
 
 user = None
 board = ttt.initial_state()
-ai_turn = False
 
 while True:
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            cancel_search()
+            executor.shutdown(wait=False)
             sys.exit()
 
     screen.fill(black)
@@ -67,13 +107,12 @@ while True:
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (ttt.COLS / 2 * tile_size),
+                       height / 2 - (ttt.ROWS / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(ttt.ROWS):
             row = []
-            for j in range(3):
+            for j in range(ttt.COLS):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -102,45 +141,51 @@ while True:
         elif user == player:
             title = f"Play as {user}"
         else:
-            title = f"Computer thinking..."
+            dots = "." * (int(time.perf_counter() * 3) % 4)
+            title = f"Computer thinking{dots:<3}"
         title = largeFont.render(title, True, white)
         titleRect = title.get_rect()
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
-        # Check for AI move
+        # Check for AI move: start a search, and play its move once done
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
+            if search is None:
+                stop = threading.Event()
+                search = executor.submit(ttt.minimax, board, stop)
+                search_started = time.perf_counter()
+            elif (search.done()
+                  and time.perf_counter() - search_started >= AI_DELAY):
+                move = search.result()
+                search = None
                 board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
 
         # Check for a user move
         click, _, _ = pygame.mouse.get_pressed()
         if click == 1 and user == player and not game_over:
             mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
-                    if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
+            legal = ttt.actions(board)
+            for i in range(ttt.ROWS):
+                for j in range(ttt.COLS):
+                    if ((i, j) in legal and tiles[i][j].collidepoint(mouse)):
                         board = ttt.result(board, (i, j))
 
-        if game_over:
-            againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
-            again = mediumFont.render("Play Again", True, black)
-            againRect = again.get_rect()
-            againRect.center = againButton.center
-            pygame.draw.rect(screen, white, againButton)
-            screen.blit(again, againRect)
-            click, _, _ = pygame.mouse.get_pressed()
-            if click == 1:
-                mouse = pygame.mouse.get_pos()
-                if againButton.collidepoint(mouse):
-                    time.sleep(0.2)
-                    user = None
-                    board = ttt.initial_state()
-                    ai_turn = False
+        # The game can be restarted at any time, even while the AI thinks
+        againButton = pygame.Rect(width / 3, height - 65, width / 3, 50)
+        label = "Play Again" if game_over else "Reset"
+        again = mediumFont.render(label, True, black)
+        againRect = again.get_rect()
+        againRect.center = againButton.center
+        pygame.draw.rect(screen, white, againButton)
+        screen.blit(again, againRect)
+        click, _, _ = pygame.mouse.get_pressed()
+        if click == 1:
+            mouse = pygame.mouse.get_pos()
+            if againButton.collidepoint(mouse):
+                time.sleep(0.2)
+                cancel_search()
+                user = None
+                board = ttt.initial_state()
 
     pygame.display.flip()
+    clock.tick(60)
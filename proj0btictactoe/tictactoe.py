@@ -4,51 +4,91 @@ Tic Tac Toe Player
 
 import math
 
+import bitboard as bb
+from book import Book
+from mnk import MNKGame
+from transposition import TranspositionTable
+
 X = "X"
 O = "O"
 EMPTY = None
 
+# The game logic lives in bitboard.py, which represents a board as
+# two 9-bit integers.  The functions below keep the nested list
+# interface that runner.py uses, converting on the way in and out.
+
+TURNS = {bb.X_TURN: X, bb.O_TURN: O, 0: None}
+
+# The answer for every reachable board, solved ahead of time and
+# read from a file the first time minimax is called, see book.py
+book = Book()
+
+# Used instead of the book for boards that can't happen in a game
+table = TranspositionTable()
+
+# Board size and win length, see configure.  For anything but the
+# usual 3 x 3 board with 3 in a row, the functions below go through the
+# general alpha-beta engine of mnk.py instead of bitboard.py and the book
+ROWS, COLS, K = 3, 3, 3
+engine = None
+time_limit = 1.0
+
+# SearchReport of the last engine search, with its node counts
+last_report = None
+
+
+def configure(rows=3, cols=3, k=3, gravity=False, seconds=1.0):
+    """
+    Sets the board size, the number in a row needed to win, whether
+    pieces fall to the bottom of their column (like Connect Four), and
+    the time minimax may think for on boards other than tic-tac-toe.
+    """
+    global ROWS, COLS, K, engine, time_limit
+    ROWS, COLS, K = rows, cols, k
+    time_limit = seconds
+    if (rows, cols, k, gravity) == (3, 3, 3, False):
+        engine = None
+    else:
+        engine = MNKGame(rows, cols, k, gravity)
+
 
 def initial_state():
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * COLS for _ in range(ROWS)]
 
 
 def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    flatten = [item for row in board for item in row]
-    if flatten.count(X) > flatten.count(O):
-        return O
-    else:
-        return X
+    if engine is not None:
+        return TURNS[engine.to_move(*engine.from_lists(board))]
+    return TURNS[bb.player(*bb.from_lists(board))]
 
 
 def actions(board):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    return {(i,j) for i, row in enumerate(board)
-            for j,item in enumerate(row) if item is None}
+    if engine is not None:
+        return {engine.to_action(cell)
+                for cell in engine.legal_cells(*engine.from_lists(board))}
+    return {bb.to_action(move) for move in bb.actions(*bb.from_lists(board))}
 
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    #for row in board:
-    #    print(row)
-    #print(action)
-    
     if board[action[0]][action[1]] is not None:
         raise ValueError('Invalid action')
-    import copy
-    newboard = copy.deepcopy(board)
+    if engine is not None and action not in actions(board):
+        raise ValueError('Invalid action')
+
+    # the cells are strings or None, so copying the rows is enough
+    newboard = [row[:] for row in board]
     newboard[action[0]][action[1]] = player(board)
     return newboard
 
@@ -57,34 +97,18 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    # check rows for winner
-    for row in board:
-        if all([item == row[0] for item in row]) and row[0]:
-            return row[0]
-
-    # check cols for winner
-    for i in range(3):
-        col = [row[i] for row in board]
-        if all([item == col[0] for item in col]) and col[0]:
-            return col[0]
-
-    # check diagonals
-    diagonal = [board[i][i] for i in range(3)]
-    if all([item == diagonal[0] for item in diagonal]) and diagonal[0]:
-        return diagonal[0]
-    diagonal = [board[i][2-i] for i in range(3)]
-    if all([item == diagonal[0] for item in diagonal]) and diagonal[0]:
-        return diagonal[0]
-
-    # There is no winner
-    return None
+    if engine is not None:
+        return TURNS[engine.winner(*engine.from_lists(board))]
+    return TURNS[bb.winner(*bb.from_lists(board))]
 
 
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    return winner(board) or all([cell for row in board for cell in row])
+    if engine is not None:
+        return engine.terminal(*engine.from_lists(board))
+    return bb.terminal(*bb.from_lists(board))
 
 
 def utility(board):
@@ -94,113 +118,48 @@ def utility(board):
     # For me the most natural way to approach this problem would be
     # to extent this function to all boards, but this would contradict
     # some part of the instructions, so I didn't do that.
-    valmap = {X: 1, O: -1, None: 0}
-    return valmap[winner(board)]
+    if engine is not None:
+        return engine.winner(*engine.from_lists(board))
+    return bb.utility(*bb.from_lists(board))
 
 
-def minimax(board):
+def minimax(board, stop=None):
     """
     Returns the optimal action for the current player on the board.
-    """
-
-    # we will recursively iterate through the moves available.
-    # for each move, 
-    # we will keep track of the moves computed (and their utility)
-    # using a dict whose keys are 0, -1, 1 and whose values are
-    # lists of moves.  As soon as we find a move with utility 1
-    # (for player X), we can return that move; this is  A*-pruning.
-
-    
-    
-    # check for a terminal board
-    if terminal(board):
+    On boards other than tic-tac-toe, setting the threading.Event stop
+    ends the search early (see runner.py, which searches in a thread).
+    """
+    global last_report
+
+    # bigger boards can't be solved completely: search as deep as the
+    # time limit allows, see mnk.py
+    if engine is not None:
+        last_report = engine.search(board, time_limit, stop=stop)
+        return last_report.move
+
+    # the whole game is solved in the book, so this is a lookup.
+    # The book was built by searching recursively through the moves
+    # available, taking a winning move as soon as one is found, with
+    # values memoized up to rotations and reflections (transposition.py)
+    x, o = bb.from_lists(board)
+    try:
+        move, _ = book.lookup(x, o)
+    except KeyError:
+        move = table.best_move(x, o)
+    if move is None:
         return None
+    return bb.to_action(move)
+
 
-    # 
-    avail_moves = actions(board)
-    moveutils = {1:[], 0:[], -1:[]}
-
-    if player(board) == X:
-        for move in avail_moves:
-
-            # determin the utility of the current move
-            # then add it to the dictionary
-            moveutils[min_value(result(board, move))].append(move)
-
-            # if a winning move has been fonud, take it
-            if len(moveutils[1])>0:
-                return moveutils[1][0]
-
-            # otherwise, keep searching
-
-        # no winning move is available
-        # choose from among the best available moves
-        bestutil = max([key for key, val in moveutils.items() if len(val)>0])
-        return moveutils[bestutil][0]
-    
-    else: #player(board) == O
-        for move in avail_moves:
-            
-            # determin the utility of the current move
-            # then add it to the dictionary
-            moveutils[max_value(result(board, move))].append(move)
-
-            # if a winning move has been fonud, take it
-            if len(moveutils[-1])>0:
-                return moveutils[-1][0]
-
-            # otherwise, keep searching
-
-        # no winning move is available
-        # choose from among the best available moves
-        bestutil = min([key for key, val in moveutils.items() if len(val)>0])
-        return moveutils[bestutil][0]
-    
-        
 def max_value(board):
-    # make a set to hold the utility values of subsequent boards
-    # This is preferable to using math.inf because the utility
-    # values have a known bound
-    
-    v = {-2}
-
-    # if the board is terminal, return its utility
-    if terminal(board):
-        return utility(board)
-
-    # otherwise, iterate through available moves
-    # for each one, compute the utility (to min_player)
-    # of result(board, move)
-    # add this value to the set
-    
-    for move in actions(board):
-        v.add(min_value(result(board, move)))
-
-        # if ever a winning move has been found, we can halt
-        if 1 in v:
-            return 1
-    return max(v)
+    """
+    Returns the utility of a board with X to move, under optimal play.
+    """
+    return bb.max_value(*bb.from_lists(board))
+
 
 def min_value(board):
-    # make a set to hold the utility values of subsequent boards
-    # This is preferable to using math.inf because the utility
-    # values have a known bound
-
-    v = {2}
-
-    # if the board is terminal, return its utility    
-    if terminal(board):
-        return utility(board)
-
-    # otherwise, iterate through available moves
-    # for each one, compute the utility (to max_player)
-    # of result(board, move)
-    # add this value to the set
-    
-    for move in actions(board):
-        v.add(max_value(result(board, move)))
-
-        # if ever a winning move has been found, we can halt
-        if -1 in v:
-            return -1
-    return min(v)
+    """
+    Returns the utility of a board with O to move, under optimal play.
+    """
+    return bb.min_value(*bb.from_lists(board))
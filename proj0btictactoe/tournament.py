@@ -0,0 +1,156 @@
+"""
+Headless self-play tournament: plays games between two agents through
+the functions of tictactoe.py, without pygame, spread over a process
+pool.
+
+Usage: python tournament.py X-agent O-agent [games] [processes]
+
+The agents are:
+
+    minimax  the plain search of bitboard.py, without any memoization
+    cached   tictactoe.minimax, i.e. the opening book (and the
+             transposition table for boards not in the book)
+    random   a uniformly random legal move
+
+It prints the results, games per second, and for each agent the nodes
+searched per move (except for cached, whose moves are book lookups) and
+the percentiles of the time taken per move, so it can be rerun as a
+regression benchmark after changing the engine.
+Random moves are seeded with the game number, so a run is repeatable.
+Counting the nodes of the minimax agent means searching every new
+position twice (see count_nodes), which games per second includes;
+the move times don't.
+"""
+
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import bitboard as bb
+import tictactoe as ttt
+
+AGENTS = ["minimax", "cached", "random"]
+
+
+def count_nodes(x, o):
+    """
+    Returns the number of positions bb.minimax visits from (x, o).
+
+    The timed search runs without a counter, so that counting doesn't
+    slow it down; instead the same search is run once more with one.
+    Only done in the worker processes, outside of the timed moves.
+    """
+    counter = [0]
+    bb.minimax(x, o, counter)
+    return counter[0]
+
+
+# nodes of the minimax agent by position, as the search is deterministic
+minimax_nodes = {}
+
+
+def play_move(agent, board, rng):
+    """
+    Returns (action, nodes searched, seconds taken) for agent on board,
+    nodes being None for the cached agent, which doesn't search.
+    """
+    if agent == "minimax":
+        x, o = bb.from_lists(board)
+        start = time.perf_counter()
+        action = bb.to_action(bb.minimax(x, o))
+        elapsed = time.perf_counter() - start
+        if (x, o) not in minimax_nodes:
+            minimax_nodes[(x, o)] = count_nodes(x, o)
+        return action, minimax_nodes[(x, o)], elapsed
+
+    if agent == "cached":
+        # a lookup in the book, so there are no nodes to count
+        start = time.perf_counter()
+        action = ttt.minimax(board)
+        elapsed = time.perf_counter() - start
+        return action, None, elapsed
+
+    start = time.perf_counter()
+    action = rng.choice(sorted(ttt.actions(board)))
+    elapsed = time.perf_counter() - start
+    return action, 0, elapsed
+
+
+def play_game(args):
+    """
+    Plays game number seed between the agents x_agent and o_agent.
+    Returns the winner ("X", "O" or None) and the list of
+    (player, nodes, seconds) of every move.
+    """
+    x_agent, o_agent, seed = args
+    rng = random.Random(seed)
+    board = ttt.initial_state()
+    moves = []
+    while not ttt.terminal(board):
+        player = ttt.player(board)
+        agent = x_agent if player == ttt.X else o_agent
+        action, nodes, elapsed = play_move(agent, board, rng)
+        board = ttt.result(board, action)
+        moves.append((player, nodes, elapsed))
+    return ttt.winner(board), moves
+
+
+def percentile(values, p):
+    """Nearest-rank percentile p (0 to 100) of the sorted list values."""
+    index = max(0, min(len(values) - 1, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def tournament(x_agent, o_agent, games, processes=None):
+    """
+    Plays games games and returns the results: wins per player (None for
+    ties), elapsed seconds, and the nodes and move times per player.
+    """
+    wins = {ttt.X: 0, ttt.O: 0, None: 0}
+    nodes = {ttt.X: [], ttt.O: []}
+    latencies = {ttt.X: [], ttt.O: []}
+    jobs = [(x_agent, o_agent, seed) for seed in range(games)]
+    start = time.perf_counter()
+    chunksize = max(1, games // (4 * (processes or os.cpu_count())))
+    with Pool(processes) as pool:
+        for winner, moves in pool.imap_unordered(play_game, jobs, chunksize):
+            wins[winner] += 1
+            for player, count, elapsed in moves:
+                nodes[player].append(count)
+                latencies[player].append(elapsed)
+    elapsed = time.perf_counter() - start
+    return {"wins": wins, "elapsed": elapsed,
+            "nodes": nodes, "latencies": latencies}
+
+
+def main():
+    if not 3 <= len(sys.argv) <= 5 or not set(sys.argv[1:3]) <= set(AGENTS):
+        sys.exit("Usage: python tournament.py X-agent O-agent [games] "
+                 "[processes]\nAgents: " + ", ".join(AGENTS))
+    x_agent, o_agent = sys.argv[1], sys.argv[2]
+    games = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    processes = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    stats = tournament(x_agent, o_agent, games, processes)
+    wins = stats["wins"]
+    print(f"{x_agent} (X) vs {o_agent} (O): {games} games in "
+          f"{stats['elapsed']:.2f}s, {games / stats['elapsed']:,.1f} games/s")
+    print(f"X wins {wins[ttt.X]}, O wins {wins[ttt.O]}, ties {wins[None]}")
+
+    for player, agent in [(ttt.X, x_agent), (ttt.O, o_agent)]:
+        nodes = stats["nodes"][player]
+        latencies = sorted(stats["latencies"][player])
+        if not latencies:
+            continue
+        ms = [1000 * percentile(latencies, p) for p in (50, 90, 99, 100)]
+        searched = ("book lookups" if agent == "cached"
+                    else f"{sum(nodes) / len(nodes):,.1f} nodes/move")
+        print(f"{player} {agent}: {len(latencies)} moves, {searched}, latency "
+              f"p50 {ms[0]:.3f}ms p90 {ms[1]:.3f}ms p99 {ms[2]:.3f}ms "
+              f"max {ms[3]:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Transposition table for the bitboard tic-tac-toe engine.
+
+The plain minimax search re-solves the same position every time it is
+reached through a different move order, and a position and its
+rotations and reflections all have the same value.  TranspositionTable
+memoizes the value of each position under a canonical key: the
+smallest (x, o) encoding among the 8 symmetric versions of the board.
+The whole game then has only 765 distinct positions to solve.
+"""
+
+import bitboard as bb
+
+
+def transform_table(cell_map):
+    """
+    Returns the 512-entry table mapping a 9-bit mask to the mask
+    obtained by moving the bit of cell k to cell cell_map[k].
+    """
+    table = []
+    for mask in range(bb.FULL + 1):
+        moved = 0
+        for k in range(9):
+            if mask >> k & 1:
+                moved |= 1 << cell_map[k]
+        table.append(moved)
+    return tuple(table)
+
+
+def symmetries():
+    """Returns the transform tables of the 8 symmetries of the board."""
+    rotate = [3 * j + (2 - i) for i in range(3) for j in range(3)]
+    reflect = [3 * i + (2 - j) for i in range(3) for j in range(3)]
+    maps = []
+    cell_map = list(range(9))
+    for _ in range(4):
+        maps.append(cell_map)
+        maps.append([reflect[k] for k in cell_map])
+        cell_map = [rotate[k] for k in cell_map]
+    return tuple(transform_table(cell_map) for cell_map in maps)
+
+
+SYMMETRIES = symmetries()
+
+
+def canonical(x, o):
+    """
+    Returns the key shared by (x, o) and all its rotations and
+    reflections.
+    """
+    return min((table[x] << 9) | table[o] for table in SYMMETRIES)
+
+
+class TranspositionTable():
+    """
+    Memoized minimax solver for bitboards.  Reuse one object across
+    searches to keep what it has learned; hits and misses count the
+    lookups of the value cache.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.hits = 0
+        self.misses = 0
+
+    def value(self, x, o):
+        """Returns the minimax value of (x, o) (1 X wins, -1 O wins)."""
+        key = canonical(x, o)
+        value = self.values.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        if bb.terminal(x, o):
+            value = bb.utility(x, o)
+        elif bb.player(x, o) == bb.X_TURN:
+            value = -1
+            for move in bb.actions(x, o):
+                value = max(value, self.value(x | move, o))
+                if value == 1:
+                    break
+        else:
+            value = 1
+            for move in bb.actions(x, o):
+                value = min(value, self.value(x, o | move))
+                if value == -1:
+                    break
+        self.values[key] = value
+        return value
+
+    def best_move(self, x, o):
+        """
+        Returns the optimal single-bit move for the player to move,
+        or None on a terminal board.
+        """
+        if bb.terminal(x, o):
+            return None
+        maximizing = bb.player(x, o) == bb.X_TURN
+        best_move, best_value = None, None
+        for move in bb.actions(x, o):
+            value = self.value(*bb.result(x, o, move))
+            if (best_value is None or (value > best_value if maximizing
+                                       else value < best_value)):
+                best_move, best_value = move, value
+                if value == (1 if maximizing else -1):
+                    break
+        return best_move
+
+    def clear(self):
+        self.values.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {"positions": len(self.values),
+                "hits": self.hits, "misses": self.misses}
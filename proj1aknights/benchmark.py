@@ -0,0 +1,55 @@
+"""
+Times model_check with each backend on a knowledge base of n symbols
+that entails its query, so the enumerating backends have to go through
+all 2**n models.
+
+Usage: python benchmark.py [symbols]
+
+The parallel backend is timed with 1, 2, 4, ... processes up to the
+number of CPUs, and its speedup over the serial enumeration printed,
+to see how it scales.
+"""
+
+import os
+import sys
+import time
+
+from logic import And, Implication, Symbol, model_check
+
+
+def chain(n):
+    """s0, s0 => s1, ..., s(n-2) => s(n-1), and the query s(n-1)."""
+    symbols = [Symbol(f"s{i}") for i in range(n)]
+    knowledge = And(symbols[0], *[Implication(symbols[i], symbols[i + 1])
+                                  for i in range(n - 1)])
+    return knowledge, symbols[-1]
+
+
+def timed(label, knowledge, query, **options):
+    start = time.perf_counter()
+    result = model_check(knowledge, query, **options)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>14}: {result} in {elapsed:.3f}s")
+    return elapsed
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python benchmark.py [symbols]")
+    n = int(sys.argv[1]) if len(sys.argv) == 2 else 20
+    knowledge, query = chain(n)
+    print(f"{n} symbols, {2 ** n} models")
+
+    serial = timed("enumerate", knowledge, query)
+    processes = 1
+    while processes <= os.cpu_count():
+        elapsed = timed(f"parallel x{processes}", knowledge, query,
+                        backend="parallel", processes=processes)
+        print(f"{'':>16}speedup {serial / elapsed:.2f}")
+        processes *= 2
+    timed("compiled", knowledge, query, backend="compiled")
+    timed("sat", knowledge, query, backend="sat")
+
+
+if __name__ == "__main__":
+    main()
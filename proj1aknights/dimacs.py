@@ -0,0 +1,88 @@
+"""
+Streaming reader for CNF files in the DIMACS format used by SAT
+competitions and benchmark suites like SATLIB:
+
+    c a comment
+    p cnf 3 2
+    1 -3 0
+    2 3 -1 0
+
+Each clause is a list of non-zero literals ended by 0, and may span
+several lines.  Clauses are read one at a time, so they can go straight
+into the solver without the file being held in memory.
+
+Usage: python dimacs.py file.cnf [file.cnf ...]
+
+loads and solves each file and prints the result, the time it took to
+load and to solve, and the solver's statistics.
+"""
+
+import sys
+import time
+
+from logic import And, Not, Or, Symbol
+from sat import Solver
+
+
+def read_clauses(f):
+    """
+    Yields the clauses of the open DIMACS file f as lists of literals.
+    """
+    clause = []
+    for line in f:
+        line = line.strip()
+        if not line or line[0] in "cp":
+            continue
+        if line[0] == "%":
+            # SATLIB files end with a % line
+            break
+        for literal in map(int, line.split()):
+            if literal == 0:
+                yield clause
+                clause = []
+            else:
+                clause.append(literal)
+    if clause:
+        yield clause
+
+
+def load_solver(path):
+    """Returns a sat.Solver with the clauses of the DIMACS file path."""
+    with open(path) as f:
+        return Solver(read_clauses(f))
+
+
+def load_sentence(path):
+    """
+    Returns the clauses of the DIMACS file path as an And of Ors, variable
+    v becoming Symbol(str(v)).
+    """
+    symbols = {}
+
+    def literal(literal):
+        name = str(abs(literal))
+        if name not in symbols:
+            symbols[name] = Symbol(name)
+        return symbols[name] if literal > 0 else Not(symbols[name])
+
+    with open(path) as f:
+        return And(*[Or(*[literal(l) for l in clause])
+                     for clause in read_clauses(f)])
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python dimacs.py file.cnf [file.cnf ...]")
+    for path in sys.argv[1:]:
+        start = time.perf_counter()
+        solver = load_solver(path)
+        loaded = time.perf_counter()
+        satisfiable = solver.solve()
+        solved = time.perf_counter()
+        print(f"{path}: {'SAT' if satisfiable else 'UNSAT'}, loaded in "
+              f"{loaded - start:.3f}s, solved in {solved - loaded:.3f}s")
+        print(f"    {solver.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,55 @@
 import itertools
+import os
+import weakref
+from multiprocessing import Pool
+
+from sat import Solver
 
 
 class Sentence():
+    """
+    Sentences are immutable and hash-consed: building a sentence that is
+    structurally equal to one that already exists returns the existing
+    object, so equal sentences are the same object, compare by identity
+    and share their subformulas.  Each node keeps its hash and the set
+    of its symbols, computed once when it is built.
+    """
+
+    __slots__ = ("args", "_hash", "_symbols", "__weakref__")
+
+    # (class, args) -> the node built from them, for as long as it's used
+    interned = weakref.WeakValueDictionary()
+
+    @classmethod
+    def intern(cls, args, symbols, **fields):
+        """
+        Returns the node of class cls built from args, creating it with
+        the given symbols and attributes if it doesn't exist yet.
+        """
+        key = (cls, args)
+        node = Sentence.interned.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            for name, value in fields.items():
+                object.__setattr__(node, name, value)
+            object.__setattr__(node, "args", args)
+            object.__setattr__(node, "_hash", hash(key))
+            object.__setattr__(node, "_symbols", symbols)
+            Sentence.interned[key] = node
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError("sentences are immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("sentences are immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # unpickled (or copied) sentences go through interning again
+        return (type(self), self.args)
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -13,7 +61,7 @@ class Sentence():
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self._symbols)
 
     @classmethod
     def validate(cls, sentence):
@@ -34,7 +82,7 @@ class Sentence():
                         return False
                     count -= 1
             return count == 0
-        if not len(s) or s.isalpha() or (
+        if not len(s) or s.isalpha() or s in ("⊤", "⊥") or (
             s[0] == "(" and s[-1] == ")" and balanced(s[1:-1])
         ):
             return s
@@ -43,15 +91,10 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
-
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __new__(cls, name):
+        return cls.intern((name,), frozenset([name]), name=name)
 
     def __repr__(self):
         return self.name
@@ -65,20 +108,13 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
-
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
+    __slots__ = ("operand",)
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
-
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return cls.intern((operand,), operand._symbols, operand=operand)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -89,23 +125,15 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
-
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+    __slots__ = ("conjuncts",)
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        symbols = frozenset().union(*[c._symbols for c in conjuncts])
+        return cls.intern(conjuncts, symbols, conjuncts=conjuncts)
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +142,31 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        raise TypeError("sentences are immutable, use "
+                        "And(*knowledge.conjuncts, conjunct) or a "
+                        "KnowledgeBase instead")
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
     def formula(self):
+        if not self.conjuncts:
+            # always true
+            return "⊤"
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
-
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
-
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        symbols = frozenset().union(*[d._symbols for d in disjuncts])
+        return cls.intern(disjuncts, symbols, disjuncts=disjuncts)
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -152,29 +176,24 @@ class Or(Sentence):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
     def formula(self):
+        if not self.disjuncts:
+            # always false
+            return "⊥"
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
-
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return cls.intern((antecedent, consequent),
+                          antecedent._symbols | consequent._symbols,
+                          antecedent=antecedent, consequent=consequent)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -188,24 +207,15 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
-
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
-
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return cls.intern((left, right), left._symbols | right._symbols,
+                          left=left, right=right)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -217,44 +227,386 @@ class Biconditional(Sentence):
                     and not self.right.evaluate(model)))
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
+class Encoder():
+    """
+    Tseitin encoding of Sentences into clauses for sat.Solver.
+
+    Every symbol gets a variable, and so does every And, Or, Implication
+    and Biconditional, together with clauses saying that this variable
+    is true exactly when the subformula is.  The clauses grow linearly
+    with the size of the sentence, unlike the CNF obtained by
+    distributing Or over And, and are satisfiable exactly when the
+    sentences added are.
+    """
+
+    def __init__(self):
+        self.variables = {}
+        self.names = {}
+        self.clauses = []
+        self.count = 0
+        # sentence -> literal, so a subformula that is shared (which
+        # with hash-consing is any repeated one) is only encoded once
+        self.encoded = {}
+
+    def variable(self, name):
+        """Returns the variable of the symbol name."""
+        if name not in self.variables:
+            self.variables[name] = self.new_variable()
+            self.names[self.variables[name]] = name
+        return self.variables[name]
+
+    def new_variable(self):
+        self.count += 1
+        return self.count
+
+    def add(self, sentence):
+        """Adds clauses saying that sentence is true."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or) and sentence.disjuncts:
+            self.clauses.append([self.literal(disjunct)
+                                 for disjunct in sentence.disjuncts])
         else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """Returns a literal that is true exactly when sentence is."""
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if sentence in self.encoded:
+            return self.encoded[sentence]
+
+        if isinstance(sentence, (And, Or)):
+            operands = (sentence.conjuncts if isinstance(sentence, And)
+                        else sentence.disjuncts)
+            literals = [self.literal(operand) for operand in operands]
+            if len(literals) == 1:
+                return literals[0]
+            v = self.new_variable()
+            if isinstance(sentence, And):
+                # v => each literal, and all literals => v
+                for literal in literals:
+                    self.clauses.append([-v, literal])
+                self.clauses.append([v] + [-literal for literal in literals])
+            else:
+                # each literal => v, and v => some literal
+                for literal in literals:
+                    self.clauses.append([v, -literal])
+                self.clauses.append([-v] + literals)
+        elif isinstance(sentence, Implication):
+            a = self.literal(sentence.antecedent)
+            b = self.literal(sentence.consequent)
+            v = self.new_variable()
+            self.clauses += [[-v, -a, b], [v, a], [v, -b]]
+        elif isinstance(sentence, Biconditional):
+            a = self.literal(sentence.left)
+            b = self.literal(sentence.right)
+            v = self.new_variable()
+            self.clauses += [[-v, -a, b], [-v, a, -b], [v, a, b], [v, -a, -b]]
+        else:
+            raise TypeError(f"can't encode {sentence!r}")
+        self.encoded[sentence] = v
+        return v
+
+
+class KnowledgeBase():
+    """
+    Knowledge that is encoded once and can then answer many queries.
+
+    Sentences are added to a single SAT solver as they come, and every
+    query is a call to the solver with assumptions, so what the solver
+    has learnt answering one query speeds up the next ones.
+    """
+
+    def __init__(self, *sentences):
+        self.encoder = Encoder()
+        self.solver = Solver()
+        # clauses of the encoder already given to the solver
+        self.sent = 0
+        # names of the symbols of the knowledge (queries add others to
+        # the encoder)
+        self.names = set()
+        for sentence in sentences:
+            self.add(sentence)
+
+    def flush(self):
+        for clause in self.encoder.clauses[self.sent:]:
+            self.solver.add_clause(clause)
+        self.sent = len(self.encoder.clauses)
+
+    def add(self, sentence):
+        """Adds sentence to the knowledge."""
+        Sentence.validate(sentence)
+        self.encoder.add(sentence)
+        self.flush()
+        self.names |= sentence.symbols()
+
+    def literals(self, sentences):
+        """
+        Returns solver literals true exactly when the sentences are.  Only
+        definitions of new variables are added to the solver, which
+        don't constrain the symbols.
+        """
+        literals = [self.encoder.literal(sentence) for sentence in sentences]
+        self.flush()
+        return literals
+
+    def consistent(self, assumptions=()):
+        """
+        Returns True if the knowledge and the sentences of assumptions can
+        all be true together.
+        """
+        return self.solver.solve(self.literals(assumptions))
+
+    def entails(self, query, assumptions=()):
+        """
+        Returns True if the knowledge, together with the sentences of
+        assumptions, entails query.
+        """
+        *literals, goal = self.literals(list(assumptions) + [query])
+        return not self.solver.solve(literals + [-goal])
+
+    def entailed_literals(self):
+        """
+        Returns the set of Symbols and negated Symbols, over the symbols
+        of the knowledge, that it entails (all of them, if it's
+        inconsistent).
+
+        The candidates are the literals of a first model.  Each round asks
+        for a model where at least one of them is false: if there is none
+        they are all entailed, otherwise the ones this model falsifies
+        are dropped.  When the knowledge forces the symbols, that is a
+        single extra solve.
+        """
+        variables = self.encoder.variables
+        if not self.solver.solve():
+            return ({Symbol(name) for name in self.names}
+                    | {Not(Symbol(name)) for name in self.names})
+        model = self.solver.model
+        # a symbol without a variable in the model (it never made it into
+        # a clause) is unconstrained, so it is not a candidate
+        candidates = {name: model[variables[name]] for name in self.names
+                      if variables.get(name, len(model)) < len(model)}
+        while candidates:
+            # the clause is only active while its switch is assumed, and
+            # is turned off for good afterwards
+            switch = self.encoder.new_variable()
+            self.solver.add_clause(
+                [-switch] + [-variables[name] if value else variables[name]
+                             for name, value in candidates.items()])
+            found = self.solver.solve([switch])
+            self.solver.add_clause([-switch])
+            if not found:
+                break
+            model = self.solver.model
+            candidates = {name: value for name, value in candidates.items()
+                          if model[variables[name]] == value}
+        return {Symbol(name) if value else Not(Symbol(name))
+                for name, value in candidates.items()}
+
+
+# Instructions of a Program
+LOAD, NOT, AND, OR, IMPLIES, IFF = range(6)
+
+# A Program evaluates this many symbols at once (2**16 models per pass)
+BLOCK_BITS = 16
+
+
+class Program():
+    """
+    A Sentence compiled to a flat list of postfix instructions, which
+    evaluates it for many models at once.
+
+    The values are bit-vectors in Python integers, bit r standing for
+    model number r, so one & or | evaluates a connective in all of
+    them.  For the first BLOCK_BITS symbols (in the order of
+    self.symbols) the models of a block take every combination of
+    values; the remaining symbols are the same in the whole block, and
+    change from one block to the next.
+    """
+
+    def __init__(self, sentence, symbols=None):
+        if symbols is None:
+            symbols = sorted(sentence.symbols())
+        self.symbols = list(symbols)
+        self.code = []
+        self.emit(sentence, {name: i for i, name in enumerate(self.symbols)})
+
+    def emit(self, sentence, index):
+        if isinstance(sentence, Symbol):
+            self.code.append((LOAD, index[sentence.name]))
+        elif isinstance(sentence, Not):
+            self.emit(sentence.operand, index)
+            self.code.append((NOT, 0))
+        elif isinstance(sentence, (And, Or)):
+            operands = (sentence.conjuncts if isinstance(sentence, And)
+                        else sentence.disjuncts)
+            for operand in operands:
+                self.emit(operand, index)
+            self.code.append((AND if isinstance(sentence, And) else OR,
+                              len(operands)))
+        elif isinstance(sentence, Implication):
+            self.emit(sentence.antecedent, index)
+            self.emit(sentence.consequent, index)
+            self.code.append((IMPLIES, 0))
+        elif isinstance(sentence, Biconditional):
+            self.emit(sentence.left, index)
+            self.emit(sentence.right, index)
+            self.code.append((IFF, 0))
+        else:
+            raise TypeError(f"can't compile {sentence!r}")
+
+    def run(self, columns, mask):
+        """
+        Evaluates the program with the bit-vector columns[i] as the
+        values of symbol i; mask has a bit set for every model.
+        """
+        stack = []
+        for op, arg in self.code:
+            if op == LOAD:
+                stack.append(columns[arg])
+            elif op == NOT:
+                stack[-1] ^= mask
+            elif op == AND or op == OR:
+                if arg == 0:
+                    stack.append(mask if op == AND else 0)
+                    continue
+                value = stack[-arg]
+                for other in stack[len(stack) - arg + 1:]:
+                    if op == AND:
+                        value &= other
+                    else:
+                        value |= other
+                del stack[-arg:]
+                stack.append(value)
+            else:
+                b = stack.pop()
+                a = stack.pop()
+                if op == IMPLIES:
+                    stack.append((a ^ mask) | b)
+                else:
+                    stack.append(a ^ b ^ mask)
+        return stack[0]
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    def evaluate(self, model):
+        """Evaluates the program in a single model, like Sentence.evaluate."""
+        return bool(self.run([1 if model[name] else 0
+                              for name in self.symbols], 1))
+
+    def blocks(self):
+        """
+        Yields the bit-vector of models satisfying the sentence, one
+        block of 2**BLOCK_BITS models (fewer if there are fewer symbols)
+        at a time.  Model r of block b gives symbol i the value of bit i
+        of b * 2**BLOCK_BITS + r.
+        """
+        low = min(len(self.symbols), BLOCK_BITS)
+        size = 1 << low
+        mask = (1 << size) - 1
+        columns = []
+        for i in range(low):
+            # 2**i zeros, then 2**i ones, repeated over the block
+            period = 1 << (i + 1)
+            pattern = ((1 << (1 << i)) - 1) << (1 << i)
+            columns.append(pattern * (mask // ((1 << period) - 1)))
+        for block in range(1 << (len(self.symbols) - low)):
+            high = [mask if block >> i & 1 else 0
+                    for i in range(len(self.symbols) - low)]
+            yield self.run(columns + high, mask)
+
+    def satisfiable(self):
+        """Returns True if the sentence is true in some model."""
+        return any(bits for bits in self.blocks())
+
+
+def check_all(knowledge, query, symbols, model):
+    """Checks if knowledge base entails query, given a particular model."""
+
+    # If model has an assignment for each symbol
+    if not symbols:
+
+        # If knowledge base is true in model, then query must also be true
+        if knowledge.evaluate(model):
+            return query.evaluate(model)
+        return True
+    else:
+
+        # Choose one of the remaining unused symbols
+        remaining = symbols.copy()
+        p = remaining.pop()
+
+        # Create a model where the symbol is true
+        model_true = model.copy()
+        model_true[p] = True
+
+        # Create a model where the symbol is false
+        model_false = model.copy()
+        model_false[p] = False
+
+        # Ensure entailment holds in both models
+        return (check_all(knowledge, query, remaining, model_true) and
+                check_all(knowledge, query, remaining, model_false))
+
+
+def check_subtree(args):
+    """check_all for a pool worker, args being its arguments as a tuple."""
+    return check_all(*args)
+
+
+def parallel_check(knowledge, query, processes=None, split=None):
+    """
+    Checks if knowledge base entails query like model_check does, but
+    over a process pool: every assignment of the first split symbols is
+    a job checking the models that extend it, and the pool is stopped
+    as soon as one of them finds a model of knowledge where query is
+    false.  By default split gives about 4 jobs per process.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    processes = processes or os.cpu_count()
+    if split is None:
+        split = (4 * processes - 1).bit_length()
+    split = min(split, len(symbols))
+    fixed, remaining = symbols[:split], set(symbols[split:])
+    jobs = [(knowledge, query, remaining, dict(zip(fixed, values)))
+            for values in itertools.product([True, False], repeat=split)]
+    with Pool(processes) as pool:
+        for holds in pool.imap_unordered(check_subtree, jobs):
+            if not holds:
+                # leaving the with block terminates the other jobs
+                return False
+    return True
+
+
+def model_check(knowledge, query, backend="enumerate", processes=None):
+    """
+    Checks if knowledge base entails query.
+
+    backend is "enumerate" to check every model, "parallel" to check
+    them on processes processes (all the CPUs by default), "compiled"
+    to check them too but many at a time with a Program, or "sat" to
+    look for a model of knowledge and not query with the SAT solver of
+    sat.py, which can handle far more symbols.
+    """
+    if backend == "parallel":
+        return parallel_check(knowledge, query, processes)
+    if backend == "compiled":
+        symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+        return not Program(And(knowledge, Not(query)), symbols).satisfiable()
+    if backend == "sat":
+        encoder = Encoder()
+        encoder.add(knowledge)
+        encoder.add(Not(query))
+        return not Solver(encoder.clauses).solve()
+    if backend != "enumerate":
+        raise ValueError(f"unknown backend {backend!r}")
 
     # Get all symbols in both knowledge and query
     symbols = set.union(knowledge.symbols(), query.symbols())
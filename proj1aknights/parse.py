@@ -0,0 +1,164 @@
+"""
+Parser for the formula syntax that Sentence.formula emits:
+
+    ¬a            Not
+    a ∧ b ∧ c     And
+    a ∨ b ∨ c     Or
+    a => b        Implication
+    a <=> b       Biconditional
+    ⊤             And(), always true
+    ⊥             Or(), always false
+
+with parentheses for grouping, so parse(sentence.formula()) gives back
+sentence, except that an And or Or of a single operand formats as just
+that operand, and so comes back without the wrapper (an equivalent
+sentence, not the same one).  The ASCII forms ~ (or !), &, | are accepted too.  Without
+parentheses, ¬ binds tightest, then ∧, ∨, => (to the right) and <=>.
+A symbol name is whatever is between operators, with the surrounding
+spaces stripped, so "A is a Knight ∧ B is a Knave" has two symbols.
+
+Usage: python parse.py [file]
+
+parses the formulas of file (or standard input), one per line, and
+prints the knowledge they make and how long parsing took.
+"""
+
+import re
+import sys
+import time
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+# splitting on the operators (kept, as they are captured) leaves the
+# names in between
+TOKENS = re.compile(r"(<=>|=>|[¬~!∧&∨|()⊤⊥])")
+
+ALIASES = {"~": "¬", "!": "¬", "&": "∧", "|": "∨"}
+
+OPERATORS = {"<=>", "=>", "¬", "∧", "∨", "(", ")"}
+
+
+class ParseError(ValueError):
+    pass
+
+
+def tokenize(text):
+    """Returns the list of operators and stripped names of text."""
+    tokens = []
+    for token in TOKENS.split(text):
+        token = token.strip()
+        if token:
+            tokens.append(ALIASES.get(token, token))
+    return tokens
+
+
+class Parser():
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def expect(self, token):
+        if self.peek() != token:
+            found = "the end" if self.peek() is None else repr(self.peek())
+            raise ParseError(f"expected {token!r} but found {found} "
+                             f"in {self.text!r}")
+        self.position += 1
+
+    def parse(self):
+        if not self.tokens:
+            # an empty text is no knowledge at all
+            return And()
+        sentence = self.biconditional()
+        if self.peek() is not None:
+            raise ParseError(f"unexpected {self.peek()!r} in {self.text!r}")
+        return sentence
+
+    def biconditional(self):
+        sentence = self.implication()
+        while self.peek() == "<=>":
+            self.position += 1
+            sentence = Biconditional(sentence, self.implication())
+        return sentence
+
+    def implication(self):
+        sentence = self.disjunction()
+        if self.peek() == "=>":
+            self.position += 1
+            return Implication(sentence, self.implication())
+        return sentence
+
+    def disjunction(self):
+        disjuncts = [self.conjunction()]
+        while self.peek() == "∨":
+            self.position += 1
+            disjuncts.append(self.conjunction())
+        return disjuncts[0] if len(disjuncts) == 1 else Or(*disjuncts)
+
+    def conjunction(self):
+        conjuncts = [self.negation()]
+        while self.peek() == "∧":
+            self.position += 1
+            conjuncts.append(self.negation())
+        return conjuncts[0] if len(conjuncts) == 1 else And(*conjuncts)
+
+    def negation(self):
+        token = self.peek()
+        if token == "¬":
+            self.position += 1
+            return Not(self.negation())
+        if token == "(":
+            self.position += 1
+            sentence = self.biconditional()
+            self.expect(")")
+            return sentence
+        if token == "⊤":
+            self.position += 1
+            return And()
+        if token == "⊥":
+            self.position += 1
+            return Or()
+        if token is None or token in OPERATORS:
+            found = "the end" if token is None else repr(token)
+            raise ParseError(f"expected a sentence but found {found} "
+                             f"in {self.text!r}")
+        self.position += 1
+        return Symbol(token)
+
+
+def parse(text):
+    """Returns the Sentence written as text."""
+    return Parser(text).parse()
+
+
+def parse_lines(lines):
+    """
+    Returns the And of the sentences of lines, one per line, skipping
+    blank lines and lines starting with #.
+    """
+    return And(*[parse(line) for line in lines
+                 if line.strip() and not line.lstrip().startswith("#")])
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python parse.py [file]")
+    start = time.perf_counter()
+    if len(sys.argv) == 2:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            knowledge = parse_lines(f)
+    else:
+        knowledge = parse_lines(sys.stdin)
+    elapsed = time.perf_counter() - start
+    print(f"{len(knowledge.conjuncts)} sentences, "
+          f"{len(knowledge.symbols())} symbols, parsed in {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+A small CDCL SAT solver.
+
+Variables are the integers 1, 2, 3, ..., and a literal is a variable
+(true) or its negation (false), like in the DIMACS format.  A clause is
+a list of literals, at least one of which must be true.
+
+The solver is the usual conflict-driven clause learning loop:
+
+    - unit propagation with two watched literals per clause, so only
+      the clauses watching a literal that just became false are looked
+      at, and nothing has to be undone when backtracking,
+    - on a conflict, a clause is learnt by resolving back to the first
+      unique implication point, and the search jumps back to the
+      second highest decision level of that clause,
+    - decisions pick the unassigned variable that took part in the most
+      recent conflicts (VSIDS), with the value it had last time (phase
+      saving), and the search restarts every now and then.
+
+Clauses can be added between calls to solve, and solve can be given
+assumptions: literals that are taken as decisions before any other, so
+the solver answers "is there a model where these are true" without the
+assumptions becoming part of the clauses.  The learnt clauses follow
+from the clauses alone, so they are kept from one call to the next.
+
+logic.py encodes Sentences into clauses for it, see Encoder there, and
+KnowledgeBase for the incremental use.
+"""
+
+import heapq
+
+
+class Solver():
+
+    def __init__(self, clauses=()):
+        # per variable, index 0 unused: 1 true, -1 false, 0 unassigned
+        self.values = [0]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+        self.heap = []
+        self.increment = 1.0
+
+        # literal -> clauses watching it, i.e. to be looked at when it
+        # becomes false.  The two watched literals are clause[0] and
+        # clause[1]
+        self.watches = {}
+        self.clauses = []
+        self.learnts = []
+
+        # assigned literals in order, where each decision level starts,
+        # and the next literal to propagate
+        self.trail = []
+        self.limits = []
+        self.head = 0
+
+        # False once the clauses are known to be unsatisfiable
+        self.ok = True
+        self.model = None
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def new_variable(self):
+        """Adds a variable and returns it."""
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(False)
+        variable = len(self.values) - 1
+        self.watches[variable] = []
+        self.watches[-variable] = []
+        heapq.heappush(self.heap, (0.0, variable))
+        return variable
+
+    @property
+    def variables(self):
+        return len(self.values) - 1
+
+    def value(self, literal):
+        """1 if literal is true, -1 if it is false, 0 if unassigned."""
+        if literal > 0:
+            return self.values[literal]
+        return -self.values[-literal]
+
+    def add_clause(self, literals):
+        """
+        Adds a clause, creating its variables if needed.  Returns False
+        if the clauses have become unsatisfiable.
+        """
+        if self.limits:
+            self.backtrack(0)
+        literals = set(literals)
+        # create every variable first, so the model covers them even when
+        # the clause itself turns out to be always true
+        highest = max((abs(literal) for literal in literals), default=0)
+        while highest > self.variables:
+            self.new_variable()
+        clause = []
+        for literal in literals:
+            if -literal in literals or self.value(literal) == 1:
+                # always true
+                return self.ok
+            # literals already false for good can be left out
+            if self.value(literal) == 0:
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() is not None:
+                self.ok = False
+        else:
+            self.attach(clause)
+            self.clauses.append(clause)
+        return self.ok
+
+    def attach(self, clause):
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = 1 if literal > 0 else -1
+        self.levels[variable] = len(self.limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assigns the literals implied by the trail.  Returns a clause whose
+        literals are all false, or None if there is no conflict.
+        """
+        values = self.values
+        watches = self.watches
+        trail = self.trail
+        while self.head < len(trail):
+            false = -trail[self.head]
+            self.head += 1
+            self.propagations += 1
+            watching = watches[false]
+            kept = 0
+            i = 0
+            while i < len(watching):
+                clause = watching[i]
+                i += 1
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], false
+                first = clause[0]
+                first_value = (values[first] if first > 0
+                               else -values[-first])
+                if first_value == 1:
+                    watching[kept] = clause
+                    kept += 1
+                    continue
+
+                # look for another literal to watch
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    if (values[literal] if literal > 0
+                            else -values[-literal]) != -1:
+                        clause[1], clause[k] = literal, false
+                        watches[literal].append(clause)
+                        break
+                else:
+                    watching[kept] = clause
+                    kept += 1
+                    if first_value == -1:
+                        # conflict: keep the remaining watches and stop
+                        while i < len(watching):
+                            watching[kept] = watching[i]
+                            kept += 1
+                            i += 1
+                        del watching[kept:]
+                        self.head = len(trail)
+                        return clause
+                    self.assign(first, clause)
+            del watching[kept:]
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the clause learnt from conflict, its asserting literal
+        first, and the level to jump back to.
+        """
+        level = len(self.limits)
+        seen = set()
+        learnt = [None]
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in (clause if literal is None else clause[1:]):
+                variable = abs(other)
+                if variable not in seen and self.levels[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if self.levels[variable] == level:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+            # the next literal of the current level involved, going back
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[abs(literal)]
+        learnt[0] = -literal
+
+        if len(learnt) == 1:
+            return learnt, 0
+        # watch the literal of the highest other level second, so the
+        # clause is asserting after jumping back to that level
+        best = max(range(1, len(learnt)),
+                   key=lambda k: self.levels[abs(learnt[k])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self.levels[abs(learnt[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            # rescale everything before it overflows
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, len(self.values))
+                         if self.values[v] == 0]
+            heapq.heapify(self.heap)
+        elif self.values[variable] == 0:
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def backtrack(self, level):
+        """Undoes the assignments of the levels above level."""
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phases[variable] = literal > 0
+            self.values[variable] = 0
+            self.reasons[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = start
+
+    def pick(self):
+        """Returns the unassigned variable with the highest activity."""
+        heap = self.heap
+        while heap:
+            activity, variable = heapq.heappop(heap)
+            if (self.values[variable] == 0
+                    and -activity == self.activity[variable]):
+                return variable
+        # entries can be stale: fall back to a scan
+        for variable in range(1, len(self.values)):
+            if self.values[variable] == 0:
+                return variable
+        return None
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with the literals of
+        assumptions true, in which case self.model[v] is the value of
+        variable v (index 0 unused).
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        for literal in assumptions:
+            while abs(literal) > self.variables:
+                self.new_variable()
+        restart = 100
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.limits:
+                    self.ok = False
+                    return False
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.attach(learnt)
+                    self.learnts.append(learnt)
+                    self.assign(learnt[0], learnt)
+                # older conflicts count less and less
+                self.increment /= 0.95
+                continue
+
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.backtrack(0)
+                continue
+
+            level = len(self.limits)
+            if level < len(assumptions):
+                # the assumptions are the first decisions, one per level
+                # (an empty level if it is already true)
+                literal = assumptions[level]
+                if self.value(literal) == -1:
+                    self.backtrack(0)
+                    return False
+                self.limits.append(len(self.trail))
+                if self.value(literal) == 0:
+                    self.assign(literal, None)
+                continue
+
+            variable = self.pick()
+            if variable is None:
+                self.model = [value == 1 for value in self.values]
+                self.backtrack(0)
+                return True
+            self.decisions += 1
+            self.limits.append(len(self.trail))
+            self.assign(variable if self.phases[variable] else -variable,
+                        None)
+
+    def stats(self):
+        return {"variables": self.variables, "clauses": len(self.clauses),
+                "learnts": len(self.learnts), "conflicts": self.conflicts,
+                "decisions": self.decisions,
+                "propagations": self.propagations}
@@ -0,0 +1,8 @@
+from logic import KnowledgeBase, Or, Symbol
+
+
+def test_entailed_literals_with_satisfied_clause():
+    # Or(B, A) is already true once A is, so B only shows up in a clause
+    # that is dropped; it must still be treated as unconstrained
+    A, B = Symbol("A"), Symbol("B")
+    assert KnowledgeBase(A, Or(B, A)).entailed_literals() == {A}
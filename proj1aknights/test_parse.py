@@ -0,0 +1,35 @@
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+from parse import parse
+
+A, B, C = Symbol("A"), Symbol("B"), Symbol("C")
+
+
+def test_round_trip():
+    for sentence in [
+        A,
+        Not(A),
+        And(A, Or(B, Not(C))),
+        Implication(And(A, B), Biconditional(B, C)),
+        Not(Implication(A, Implication(B, C))),
+    ]:
+        assert parse(sentence.formula()) == sentence
+
+
+def test_round_trip_empty_connectives():
+    for sentence in [
+        And(),
+        Or(),
+        And(A, Or()),
+        Or(And(), Not(Or())),
+        Implication(And(), Biconditional(Or(), B)),
+    ]:
+        assert parse(sentence.formula()) == sentence
+
+
+def test_single_operand_connectives():
+    # formula() drops the wrapper, so only an equivalent sentence comes
+    # back
+    E = Symbol("E")
+    assert parse(And(Not(E)).formula()) == Not(E)
+    assert parse(Or(A).formula()) == A
+    assert parse(And(A, Or(B)).formula()) == And(A, B)
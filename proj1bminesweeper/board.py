@@ -0,0 +1,83 @@
+"""
+Board geometry shared by Minesweeper and MinesweeperAI.
+
+Cell (i, j) has index i * width + j, and a set of cells can be kept as
+an integer with bit index set for each of its cells, so unions,
+differences and membership are single integer operations.  The bitset
+of every cell's neighbors is computed once per board size, rather than
+walking the 3 x 3 window with bounds checks every time.
+"""
+
+import functools
+
+import numpy as np
+
+
+class Geometry():
+
+    def __init__(self, height, width):
+        self.height = height
+        self.width = width
+        self.size = height * width
+        self.full = (1 << self.size) - 1
+
+        # index -> cell
+        self.cells = [(i, j) for i in range(height) for j in range(width)]
+
+        # index -> bitset of the neighbors, not including the cell itself
+        self.neighbor_masks = [
+            sum(1 << (a * width + b)
+                for a in range(max(i - 1, 0), min(i + 2, height))
+                for b in range(max(j - 1, 0), min(j + 2, width))
+                if (a, b) != (i, j))
+            for i, j in self.cells
+        ]
+
+    def index(self, cell):
+        i, j = cell
+        return i * self.width + j
+
+    def bit(self, cell):
+        i, j = cell
+        return 1 << (i * self.width + j)
+
+    def mask(self, cells):
+        """Returns the bitset of cells."""
+        mask = 0
+        for cell in cells:
+            mask |= self.bit(cell)
+        return mask
+
+    def cells_of(self, mask):
+        """Yields the cells of the bitset mask."""
+        while mask:
+            low = mask & -mask
+            yield self.cells[low.bit_length() - 1]
+            mask ^= low
+
+    def first(self, mask):
+        """Returns the cell of the lowest bit of mask, or None if empty."""
+        if not mask:
+            return None
+        return self.cells[(mask & -mask).bit_length() - 1]
+
+    def count_map(self, board):
+        """
+        Returns an array with, for every cell, the number of mines among
+        its neighbors, board being a nested list (or array) of booleans.
+        It's the convolution of the board with a 3 x 3 kernel of ones
+        (minus the centre), done as a sum of the 8 shifted boards.
+        """
+        padded = np.pad(np.asarray(board, dtype=np.int8), 1)
+        counts = np.zeros((self.height, self.width), dtype=np.int8)
+        for di in range(3):
+            for dj in range(3):
+                if (di, dj) != (1, 1):
+                    counts += padded[di:di + self.height, dj:dj + self.width]
+        return counts
+
+
+@functools.lru_cache(maxsize=None)
+def geometry(height, width):
+    """Returns the (shared) Geometry of a height x width board."""
+    return Geometry(height, width)
@@ -1,5 +1,9 @@
 import itertools
+import math
 import random
+from collections import deque
+
+from board import geometry
 
 
 class Minesweeper():
@@ -33,6 +37,11 @@ class Minesweeper():
         # At first, player has found no mines
         self.mines_found = set()
 
+        # The number of mines next to every cell, computed once for the
+        # game
+        self.geometry = geometry(height, width)
+        self.counts = self.geometry.count_map(self.board)
+
     def print(self):
         """
         Prints a text-based representation
@@ -58,24 +67,7 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        return int(self.counts[cell])
 
     def won(self):
         """
@@ -98,6 +90,11 @@ class Sentence():
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        # the cells can change: a sentence that is in a set or dict has
+        # to be taken out before it's marked (MinesweeperAI does)
+        return hash((frozenset(self.cells), self.count))
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
@@ -146,17 +143,118 @@ class Sentence():
             self.cells.remove(cell)
 
 
+def count_configurations(cells, sentences):
+    """
+    Counts the ways of placing mines on cells (a list, ordered so that
+    neighboring cells are close to each other) that satisfy all the
+    sentences, whose cells are among them.
+
+    Returns (ways, mines): ways[k] is the number of configurations with
+    k mines, and mines[cell][k] the number of those where cell is one.
+
+    The cells are decided in order, and the state between two cells is
+    how many mines each sentence that has cells on both sides still
+    needs.  Configurations leading to the same state are counted
+    together, forwards from the first cell and backwards from the last,
+    so the work grows with the number of states rather than with the
+    number of configurations.
+    """
+    n = len(cells)
+    position = {cell: p for p, cell in enumerate(cells)}
+    constraints = [sorted(position[cell] for cell in sentence.cells)
+                   for sentence in sentences]
+    counts = [sentence.count for sentence in sentences]
+    first = [positions[0] for positions in constraints]
+    last = [positions[-1] for positions in constraints]
+    touching = [[] for _ in range(n)]
+    for c, positions in enumerate(constraints):
+        for p in positions:
+            touching[p].append(c)
+    # active[p]: the sentences with cells both before p and from p on
+    active = [[c for c in range(len(constraints)) if first[c] < p <= last[c]]
+              for p in range(n + 1)]
+    # left[c][p]: cells of sentence c after position p
+    left = [{p: len(positions) - 1 - k for k, p in enumerate(positions)}
+            for positions in constraints]
+
+    def step(p, state, mine):
+        """The state after cell p, or None if mine breaks a sentence."""
+        need = dict(zip(active[p], state))
+        for c in touching[p]:
+            remaining = need.get(c, counts[c]) - mine
+            if not 0 <= remaining <= left[c][p]:
+                return None
+            need[c] = remaining
+        return tuple(need[c] for c in active[p + 1])
+
+    # forward[p][state][k]: ways of filling cells before p with k mines
+    forward = [{(): {0: 1}}]
+    for p in range(n):
+        states = {}
+        for state, ways in forward[p].items():
+            for mine in (0, 1):
+                after = step(p, state, mine)
+                if after is None:
+                    continue
+                target = states.setdefault(after, {})
+                for k, w in ways.items():
+                    target[k + mine] = target.get(k + mine, 0) + w
+        forward.append(states)
+
+    # backward[p][state][k]: ways of filling cells from p on with k mines
+    backward = [None] * n + [{(): {0: 1}}]
+    for p in range(n - 1, -1, -1):
+        states = {}
+        for state in forward[p]:
+            total = {}
+            for mine in (0, 1):
+                after = step(p, state, mine)
+                if after is None or after not in backward[p + 1]:
+                    continue
+                for k, w in backward[p + 1][after].items():
+                    total[k + mine] = total.get(k + mine, 0) + w
+            if total:
+                states[state] = total
+        backward[p] = states
+
+    ways = backward[0].get((), {})
+    mines = {}
+    for p, cell in enumerate(cells):
+        at = {}
+        for state, before in forward[p].items():
+            after = step(p, state, 1)
+            if after is None or after not in backward[p + 1]:
+                continue
+            for kb, wb in before.items():
+                for ka, wa in backward[p + 1][after].items():
+                    at[kb + 1 + ka] = at.get(kb + 1 + ka, 0) + wb * wa
+        mines[cell] = at
+    return ways, mines
+
+
+def convolve(a, b):
+    """Distribution of the sum of two independent mine counts."""
+    total = {}
+    for ka, wa in a.items():
+        for kb, wb in b.items():
+            total[ka + kb] = total.get(ka + kb, 0) + wa * wb
+    return total
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Number of mines on the board, if known
+        self.total_mines = mines
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -164,8 +262,24 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # The same three sets as bitsets, see board.py
+        self.geometry = geometry(height, width)
+        self.move_bits = 0
+        self.mine_bits = 0
+        self.safe_bits = 0
+
+        # Sentences about the game known to be true, without duplicates,
+        # and for every cell the sentences it appears in, so marking a
+        # cell or inferring from a sentence only looks at its neighbors
+        self.knowledge = set()
+        self.index = {}
+
+        # Sentences added or changed since inferences were last drawn
+        self.pending = deque()
+
+        # count_configurations of the frontier components, by their
+        # sentences, kept while the component doesn't change
+        self.components = {}
 
     def mark_mine(self, cell):
         """
@@ -173,9 +287,11 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        # print("Mine found: ", str(self.mines))
-        for sentence in self.knowledge:
+        self.mine_bits |= self.geometry.bit(cell)
+        for sentence in list(self.index.get(cell, ())):
+            self.remove_sentence(sentence)
             sentence.mark_mine(cell)
+            self.add_sentence(sentence)
 
     def mark_safe(self, cell):
         """
@@ -183,8 +299,32 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        self.safe_bits |= self.geometry.bit(cell)
+        for sentence in list(self.index.get(cell, ())):
+            self.remove_sentence(sentence)
             sentence.mark_safe(cell)
+            self.add_sentence(sentence)
+
+    def add_sentence(self, sentence):
+        """
+        Adds sentence to the knowledge, unless it is empty or known
+        already, and queues it for inference.
+        """
+        if not sentence.cells or sentence in self.knowledge:
+            return
+        self.knowledge.add(sentence)
+        for cell in sentence.cells:
+            self.index.setdefault(cell, set()).add(sentence)
+        self.pending.append(sentence)
+
+    def remove_sentence(self, sentence):
+        self.knowledge.discard(sentence)
+        for cell in sentence.cells:
+            cells = self.index.get(cell)
+            if cells is not None:
+                cells.discard(sentence)
+                if not cells:
+                    del self.index[cell]
 
     def add_knowledge(self, cell, count):
         """
@@ -204,84 +344,58 @@ class MinesweeperAI():
 
         # Record that a move has been made and cell is safe
         self.moves_made.add(cell)
+        self.move_bits |= self.geometry.bit(cell)
         self.mark_safe(cell)
 
-        # record all neighboring cells (including cell)
-        nearby = set()
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                # if cell in bounds, add to neighbors
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    nearby.add((i,j))
-
-        # start building set of unknown neighbors by removing
-        # known safes from set
-        nearby_tbd = nearby.difference(self.safes)
+        # neighboring cells, as a bitset
+        nearby = self.geometry.neighbor_masks[self.geometry.index(cell)]
         # count number of adjacent known mines
-        nearby_mines = len(nearby_tbd.intersection(self.mines))
-        # remove those mines from set
-        nearby_tbd = nearby_tbd.difference(self.mines)
-
-        # Add the new sentence to knowledge base
-        new_knowledge = [Sentence(nearby_tbd, count-nearby_mines)]
-
-
-        # As long as we continue to make new inferences, we incorporate
-        # those inferences into our knowledge base
-        # Then look for further inferences
-
-        while new_knowledge:
-            for s in new_knowledge:
-                self.knowledge.append(s)
-
-            # empty sentences can accumulate in the knowledge base
-            # as can sentences that determine safe/mines
-            self.clean_knowledge()
+        nearby_mines = bin(nearby & self.mine_bits).count("1")
+        # the neighbors that are neither known safes nor mines
+        nearby_tbd = set(self.geometry.cells_of(
+            nearby & ~(self.safe_bits | self.mine_bits)))
 
-            # Now look for new inferences
-            new_knowledge = self.make_inferences()
+        # Add the new sentence to knowledge base, and draw what
+        # follows from it
+        self.add_sentence(Sentence(nearby_tbd, count-nearby_mines))
+        self.make_inferences()
 
     def make_inferences(self):
         """
-        Iterates through self.knowledge looking for new inferences to be made.
-        If any new inferences are found, the function continues to look for further
-        inferences that can be made.
-        """
-        new_knowledge = []
-        for s1 in self.knowledge:
-            for s2 in self.knowledge:
-                if s1 != s2 and s1.cells < s2.cells:
-                    inference = Sentence(s2.cells - s1.cells, s2.count - s1.count)
-                    if inference not in self.knowledge and inference.cells != set():
-                        new_knowledge.append(inference)
-        return new_knowledge
-    
-    def clean_knowledge(self):
-        """
-        Removes redundant/empty sentences from self.knowledge
-        """
-        new_safes, new_mines = set(), set()
-        trimmed = []
-
-        # first go through knowledge looking for new mines/safes
-        for s in self.knowledge:
-            if s.known_mines() or s.known_safes():
-                new_mines = new_mines.union(s.known_mines())
-                new_safes = new_safes.union(s.known_safes())
-
-        # then mark those cells appropriately
-        for cell in new_safes:
-            self.mark_safe(cell)
-        for cell in new_mines:
-            self.mark_mine(cell)
-
-        # now remove redundant/empty sentences from knowledge
-        for s in self.knowledge:
-            if s not in trimmed and s.cells != set():
-                trimmed.append(s)
-        
-        self.knowledge = trimmed
-    
+        Draws every inference from the sentences added or changed since
+        the last call, marking the cells they determine and adding the
+        sentences they imply by the subset method.  Only sentences that
+        share a cell with a changed one can take part, so the work
+        depends on what changed rather than on the size of the knowledge.
+        """
+        while self.pending:
+            sentence = self.pending.popleft()
+            if sentence not in self.knowledge:
+                # changed again or dropped since it was queued
+                continue
+
+            mines = sentence.known_mines()
+            safes = sentence.known_safes()
+            if mines or safes:
+                for cell in list(mines):
+                    self.mark_mine(cell)
+                for cell in list(safes):
+                    self.mark_safe(cell)
+                continue
+
+            # sentences overlapping this one, the only candidates for
+            # being a subset or a superset of it
+            related = set()
+            for cell in sentence.cells:
+                related |= self.index.get(cell, set())
+            for other in related:
+                if other.cells < sentence.cells:
+                    self.add_sentence(Sentence(sentence.cells - other.cells,
+                                               sentence.count - other.count))
+                elif sentence.cells < other.cells:
+                    self.add_sentence(Sentence(other.cells - sentence.cells,
+                                               other.count - sentence.count))
+
     def make_safe_move(self):
         """
         Returns a safe cell to choose on the Minesweeper board.
@@ -298,13 +412,121 @@ class MinesweeperAI():
         # print("Current knowledge")
         # for s in self.knowledge:
         #     print(s)
-        
-        for cell in self.safes - self.moves_made:
-            # print("")
-            # print(f"choosing to move at {cell}")
-            # print("")
-            return cell
-        return None
+
+        return self.geometry.first(self.safe_bits & ~self.move_bits)
+
+    def frontier_components(self):
+        """
+        Splits the sentences into groups that share no cells, and returns
+        a list of (cells, sentences) with the cells of each group in
+        breadth-first order.
+        """
+        components = []
+        seen = set()
+        for sentence in self.knowledge:
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            sentences = [sentence]
+            cells = []
+            placed = set()
+            queue = deque([sentence])
+            while queue:
+                current = queue.popleft()
+                for cell in sorted(current.cells):
+                    if cell in placed:
+                        continue
+                    placed.add(cell)
+                    cells.append(cell)
+                    for other in self.index[cell]:
+                        if other not in seen:
+                            seen.add(other)
+                            sentences.append(other)
+                            queue.append(other)
+            components.append((cells, sentences))
+        return components
+
+    def mine_probabilities(self):
+        """
+        Returns the probability of being a mine of every cell that is
+        neither known nor played, all the configurations of mines that
+        agree with the knowledge (and the number of mines, if known)
+        being equally likely.
+        """
+        unknown = set(self.geometry.cells_of(
+            self.geometry.full
+            & ~(self.move_bits | self.mine_bits | self.safe_bits)))
+
+        solved = []
+        components = {}
+        for cells, sentences in self.frontier_components():
+            key = frozenset((frozenset(sentence.cells), sentence.count)
+                            for sentence in sentences)
+            if key not in self.components:
+                self.components[key] = count_configurations(cells, sentences)
+            components[key] = self.components[key]
+            solved.append(components[key])
+        # drop the components that have changed since
+        self.components = components
+
+        frontier = set()
+        for _, mines in solved:
+            frontier.update(mines)
+        interior = unknown - frontier
+
+        probabilities = {}
+        if self.total_mines is None:
+            # every component on its own; for the other cells all we
+            # have is the frontier's average
+            for ways, mines in solved:
+                total = sum(ways.values())
+                for cell, at in mines.items():
+                    probabilities[cell] = sum(at.values()) / total
+            average = (sum(probabilities.values()) / len(probabilities)
+                       if probabilities else 0.5)
+            for cell in interior:
+                probabilities[cell] = average
+            return probabilities
+
+        # the mines left over from the frontier are spread over the
+        # interior, in comb(len(interior), left) ways
+        remaining = self.total_mines - len(self.mines)
+
+        def weight(frontier_mines):
+            left = remaining - frontier_mines
+            if left < 0 or left > len(interior):
+                return 0
+            return math.comb(len(interior), left)
+
+        # the mine counts of all components but one, from prefix and
+        # suffix products
+        prefix = [{0: 1}]
+        for ways, _ in solved:
+            prefix.append(convolve(prefix[-1], ways))
+        suffix = [{0: 1}]
+        for ways, _ in reversed(solved):
+            suffix.append(convolve(suffix[-1], ways))
+        suffix.reverse()
+
+        everything = prefix[-1]
+        total = sum(w * weight(k) for k, w in everything.items())
+        if total == 0:
+            # the count doesn't fit the knowledge; shouldn't happen
+            return {cell: 0.5 for cell in unknown}
+
+        for c, (_, mines) in enumerate(solved):
+            others = convolve(prefix[c], suffix[c + 1])
+            for cell, at in mines.items():
+                probabilities[cell] = sum(
+                    w * wo * weight(k + ko)
+                    for k, w in at.items() for ko, wo in others.items()
+                ) / total
+        if interior:
+            expected = sum(w * weight(k) * (remaining - k)
+                           for k, w in everything.items())
+            for cell in interior:
+                probabilities[cell] = expected / total / len(interior)
+        return probabilities
 
     def make_random_move(self):
         """
@@ -312,24 +534,15 @@ class MinesweeperAI():
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
-        """
 
-        # We will choose randomly from all the available mines.
-        # If we knew the total number of mines, we could do a bit better
-        # by choosing a mine from the cells in the sentences with the smallest
-        # ratio of mines/cells.
-        
-        board = {(i,j) for i in range(self.height) for j in range(self.width)}
-        board = board - self.moves_made.union(self.mines)
-        board = list(board)
-        if board:
-            ind = random.randrange(len(board))
-
-            # print("")
-            # print("no safe moves; Moving at " + str((i,j)))
-            # print("")
-        
-            return board[ind]
-
-        # No moves left to be made
-        return None
+        Rather than uniformly, we choose among the cells least likely to
+        be a mine, see mine_probabilities.
+        """
+        probabilities = self.mine_probabilities()
+        if not probabilities:
+            # No moves left to be made
+            return None
+        lowest = min(probabilities.values())
+        best = [cell for cell, probability in probabilities.items()
+                if probability <= lowest + 1e-12]
+        return random.choice(best)